@@ -1,3 +1,35 @@
-from .core import InputSource
+import importlib
+import os
 
-__all__ = ["InputSource"]
+from .startup import IMPORT_STARTED  # lo primero: es el origen del informe de arranque
+
+# Sin el banner de pygame en stdout (p. ej. nexus-bench escribe ahí su JSON)
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# Cada nombre se importa al usarse por primera vez: un lector de memoria compartida
+# no paga SDL, y el servidor no paga lo que no va a usar
+_EXPORTS = {
+    "InputSource": ".core",
+    "PygameBackend": ".core",
+    "DeviceManager": ".devices",
+    "Recorder": ".recording",
+    "ReplaySource": ".recording",
+    "ReplayBackend": ".recording",
+    "VirtualBackend": ".virtual",
+    "SharedFrameReader": ".shm",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
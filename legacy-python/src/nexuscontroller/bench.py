@@ -0,0 +1,282 @@
+"""Offline benchmarks of the read -> encode -> broadcast hot path.
+
+No pad needed: reads go through virtual joysticks, and broadcasts
+through an in-process WebSocket server with local clients. Results are
+written as JSON so runs can be compared over time (``--compare``).
+
+    python -m nexuscontroller.bench --output bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import itertools
+import json
+import platform
+import sys
+import time
+import timeit
+
+import websockets
+
+from .broadcast import Broadcaster
+from .core import InputSource, Pad, load_default_profile, load_pygame
+from .devices import DeviceManager
+from .plan import Frame
+from .protocol import FORMAT_BINARY, FORMAT_DELTA, FORMAT_JSON, BinaryEncoder, DeltaEncoder, JsonEncoder
+from .virtual import VirtualBackend
+
+CLIENT_COUNTS = (1, 10, 100, 1000)
+BROADCAST_FRAMES = 200
+MULTI_PADS = 4
+# Repeticiones de cada medida: se queda la mejor (la menos perturbada)
+REPEAT = 5
+
+ENCODERS = {FORMAT_JSON: JsonEncoder, FORMAT_DELTA: DeltaEncoder, FORMAT_BINARY: BinaryEncoder}
+
+
+def _timeit(fn):
+    """Best-of-REPEAT seconds per call of ``fn``."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(REPEAT, number)) / number
+    return {"ops_per_sec": round(1.0 / best, 1), "us_per_op": round(best * 1e6, 3)}
+
+
+@functools.lru_cache(maxsize=None)
+def _profile():
+    # Los avisos de carga van a stderr: stdout puede ser el propio JSON de resultados
+    with contextlib.redirect_stdout(sys.stderr):
+        return load_default_profile()
+
+
+def _processed(profile):
+    return dict(profile, processing={
+        "left_stick": {"deadzone": 0.1, "curve": "exponential"},
+        "right_stick": {"deadzone": 0.1, "type": "axial"},
+        "trigger_left": {"deadzone": 0.05},
+        "trigger_right": {"deadzone": 0.05},
+    })
+
+
+def _frames(n, multi):
+    """``n`` consecutive 60 Hz frames (or multi-pad frame lists) from virtual joysticks."""
+    profile = _profile()
+    backend = VirtualBackend(MULTI_PADS if multi else 1, seed=0)
+    pads = [Pad(backend.open(i), profile, i) for i in range(backend.count())]
+    frames = []
+    for i in range(n):
+        backend.advance(i / 60)
+        if not multi:
+            frames.append(pads[0].read())
+            continue
+        frame = []
+        for pad in pads:
+            d = pad.read()
+            d["player"] = pad.player
+            frame.append(d)
+        frames.append(frame)
+    return frames
+
+
+def bench_read():
+    profile = _profile()
+    results = {}
+    for name, mapping in (("plain", profile), ("processed", _processed(profile))):
+        backend = VirtualBackend(1, seed=0)
+        backend.advance(0.3)
+        pad = Pad(backend.open(0), mapping)
+        frame = Frame()
+        results[f"{name}.read"] = _timeit(pad.read)
+        results[f"{name}.read_into"] = _timeit(lambda: pad.read_into(frame))
+
+    # El camino completo del servidor: pump de eventos y hot-plug antes de leer el mando
+    with contextlib.redirect_stdout(sys.stderr):
+        source = InputSource(backend=VirtualBackend(1, seed=0), profile_cache=None)
+    try:
+        results["source.read"] = _timeit(source.read)
+        results["source.read_into"] = _timeit(lambda: source.read_into(frame))
+    finally:
+        source.close()
+    return results
+
+
+def bench_encode():
+    results = {}
+    single = _frames(256, multi=False)
+    multi = _frames(256, multi=True)
+
+    def cycle(fn, frames):
+        # Sin fin: autorange() + REPEAT pasan de 3M de llamadas en las operaciones de menos de 1 µs
+        it = itertools.cycle(frames)
+        return lambda: fn(next(it))
+
+    results["to_json"] = _timeit(cycle(InputSource.to_json, single))
+    results["to_bytes"] = _timeit(cycle(InputSource.to_bytes, single))
+    results["from_bytes"] = _timeit(cycle(InputSource.from_bytes, [InputSource.to_bytes(d) for d in single]))
+    results["multi.to_json"] = _timeit(cycle(DeviceManager.to_json, multi))
+
+    for is_multi, frames in ((False, single), (True, multi)):
+        for fmt, cls in ENCODERS.items():
+            encoder = cls(is_multi)
+            clock = itertools.count()
+            results[f"{'multi.' if is_multi else ''}{fmt}"] = _timeit(
+                cycle(lambda d: encoder.encode(d, next(clock) * 0.001), frames))
+    return results
+
+
+async def _broadcast_run(n_clients, fmt, frames):
+    broadcaster = Broadcaster({fmt: lambda: ENCODERS[fmt](False)})
+    connected = asyncio.Event()
+
+    async def handler(websocket):
+        broadcaster.add(websocket, fmt)
+        if len(broadcaster) == n_clients:
+            connected.set()
+        try:
+            await websocket.wait_closed()
+        finally:
+            broadcaster.remove(websocket)
+
+    async def client(uri, counts, i):
+        async with websockets.connect(uri, max_queue=None) as ws:
+            async for message in ws:
+                if message == "end":
+                    return
+                counts[i] += 1
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        uri = f"ws://127.0.0.1:{port}"
+        counts = [0] * n_clients
+        tasks = []
+        for start in range(0, n_clients, 100):
+            batch = [asyncio.create_task(client(uri, counts, i))
+                     for i in range(start, min(n_clients, start + 100))]
+            tasks.extend(batch)
+            await asyncio.sleep(0)
+        await asyncio.wait_for(connected.wait(), 60)
+
+        publish = 0.0
+        started = time.perf_counter()
+        for i, data in enumerate(frames):
+            t = time.perf_counter()
+            broadcaster.publish(data, i * 0.016)
+            publish += time.perf_counter() - t
+            # Como en el servidor real: se cede el loop entre ticks
+            await asyncio.sleep(0)
+        await broadcaster.flush()
+        broadcaster.send_all("end")
+        await asyncio.wait_for(asyncio.gather(*tasks), 120)
+        elapsed = time.perf_counter() - started
+
+    snapshot = broadcaster.snapshot().values()
+    received = sum(counts)
+    return {
+        "clients": n_clients,
+        "frames": len(frames),
+        "publish_us_per_frame": round(publish / len(frames) * 1e6, 3),
+        "delivered": received,
+        "dropped": sum(s["dropped"] for s in snapshot),
+        "messages_per_sec": round(received / elapsed, 1),
+        "seconds": round(elapsed, 4),
+    }
+
+
+def _raise_fd_limit(n_clients):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # Cada cliente en proceso son dos sockets (el del cliente y el del servidor)
+    needed = 2 * n_clients + 64
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+def bench_broadcast(client_counts=CLIENT_COUNTS, n_frames=BROADCAST_FRAMES, formats=(FORMAT_JSON, FORMAT_BINARY)):
+    _raise_fd_limit(max(client_counts))
+    frames = _frames(n_frames, multi=False)
+    results = {}
+    for fmt in formats:
+        for n in client_counts:
+            try:
+                results[f"{fmt}.{n}"] = asyncio.run(_broadcast_run(n, fmt, frames))
+            except (OSError, asyncio.TimeoutError) as e:
+                results[f"{fmt}.{n}"] = {"clients": n, "error": repr(e)}
+            print(f"  {fmt} x {n}: {results[f'{fmt}.{n}']}", file=sys.stderr)
+    return results
+
+
+def _environment():
+    pygame = load_pygame()
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "pygame": pygame.version.ver,
+        "websockets": websockets.__version__,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(old, new):
+    """Lines with the relative change of every ``ops_per_sec`` / ``messages_per_sec`` in both runs."""
+    lines = []
+    for group, results in new["results"].items():
+        for name, result in results.items():
+            before = old.get("results", {}).get(group, {}).get(name, {})
+            for key in ("ops_per_sec", "messages_per_sec"):
+                if key in result and before.get(key):
+                    change = (result[key] / before[key] - 1) * 100
+                    lines.append(f"{group}.{name}: {before[key]} -> {result[key]} {key} ({change:+.1f}%)")
+    return lines
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="nexus-bench", description="Benchmarks de NexusController")
+    parser.add_argument("--output", "-o", metavar="FICHERO", help="Guardar los resultados en JSON (default: stdout)")
+    parser.add_argument("--compare", metavar="FICHERO", help="Comparar con los resultados de otra ejecución")
+    parser.add_argument("--only", choices=("read", "encode", "broadcast"), action="append",
+                        help="Ejecutar sólo estos grupos (repetible)")
+    parser.add_argument("--clients", type=int, nargs="+", default=list(CLIENT_COUNTS),
+                        help="Número de clientes del benchmark de broadcast (default: %(default)s)")
+    parser.add_argument("--frames", type=int, default=BROADCAST_FRAMES,
+                        help="Frames por ejecución de broadcast (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    """Entry point function for the benchmark script."""
+    args = _parse_args(argv)
+    groups = args.only or ["read", "encode", "broadcast"]
+
+    report = {"environment": _environment(), "results": {}}
+    for group in groups:
+        print(f"⏱️ {group}...", file=sys.stderr)
+        if group == "read":
+            report["results"]["read"] = bench_read()
+        elif group == "encode":
+            report["results"]["encode"] = bench_encode()
+        else:
+            report["results"]["broadcast"] = bench_broadcast(args.clients, args.frames)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"💾 Resultados en {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        for line in compare(old, report):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,310 @@
+import asyncio
+import socket
+import time
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from .protocol import FULL
+
+# Bytes pendientes en el transporte a partir de los cuales un cliente se considera atascado
+MAX_WRITE_BUFFER = 16 * 1024
+
+# Ritmo adaptativo de un cliente atascado: cada atasco duplica su intervalo entre frames
+# (empezando en ADAPT_MIN_INTERVAL, hasta ADAPT_MAX_INTERVAL) y cada ADAPT_RECOVER
+# segundos sin atascos se reduce a la mitad, hasta volver a recibir todos los frames
+ADAPT_MIN_INTERVAL = 1 / 120
+ADAPT_MAX_INTERVAL = 0.5
+ADAPT_RECOVER = 1.0
+
+
+class ClientStats:
+    """Counters and send state of one client.
+
+    ``pending`` is a single latest-wins slot: once the client's transport
+    is congested, a drain task owns its sends and each new frame replaces
+    the one waiting there (``coalesced``). The drain also sets ``interval``,
+    the adaptive step between frames (0 = every frame): doubled each time
+    the previous send is still queued, halved after ``ADAPT_RECOVER``
+    seconds without that. Frames the step skips on the direct path count
+    as ``downsampled``; ``dropped`` is both together.
+    """
+
+    __slots__ = ("format", "group", "sent", "coalesced", "downsampled", "bytes_out",
+                 "pending", "stale", "task", "interval", "next_send", "last_congested")
+
+    def __init__(self, fmt, group=None):
+        self.format = fmt
+        self.group = group
+        self.sent = 0
+        self.coalesced = 0
+        self.downsampled = 0
+        self.bytes_out = 0
+
+        self.pending = None
+        # Se ha saltado algún frame: un cliente delta necesita un keyframe para seguir
+        self.stale = False
+        self.task = None
+        self.interval = 0.0
+        self.next_send = 0.0
+        self.last_congested = 0.0
+
+    def count(self, message):
+        self.sent += 1
+        self.bytes_out += len(message)
+        self.stale = False
+
+    @property
+    def dropped(self):
+        return self.coalesced + self.downsampled
+
+    def congested(self, now):
+        self.interval = min(ADAPT_MAX_INTERVAL, max(ADAPT_MIN_INTERVAL, self.interval * 2))
+        self.next_send = now + self.interval
+        self.last_congested = now
+
+    def due(self, now):
+        """Adaptive rate: False if this frame has to be skipped for this client."""
+        if not self.interval:
+            return True
+        if now - self.last_congested >= ADAPT_RECOVER:
+            self.last_congested = now
+            self.interval = 0.0 if self.interval <= ADAPT_MIN_INTERVAL else self.interval / 2
+        if now < self.next_send:
+            return False
+        self.next_send = now + self.interval
+        return True
+
+    def as_dict(self):
+        return {"format": self.format, "subscription": self.group.subscription.as_dict() if self.group else None,
+                "sent": self.sent, "dropped": self.dropped, "coalesced": self.coalesced,
+                "downsampled": self.downsampled, "bytes_out": self.bytes_out,
+                "rate_limit_hz": round(1 / self.interval, 1) if self.interval else None}
+
+
+class Group:
+    """Clients sharing a wire format and a subscription: one encoder, one payload per frame."""
+
+    __slots__ = ("format", "subscription", "encoder", "clients", "interval", "next_send")
+
+    def __init__(self, fmt, subscription, encoder):
+        self.format = fmt
+        self.subscription = subscription
+        self.encoder = encoder
+        self.clients = set()
+        self.interval = 1.0 / subscription.rate if subscription.rate else 0.0
+        self.next_send = 0.0
+
+    def due(self, now):
+        """Rate limit of the subscription: True (and book the next slot) if a frame may go out."""
+        if not self.interval:
+            return True
+        if now < self.next_send:
+            return False
+        self.next_send += self.interval
+        if self.next_send < now:
+            # Tras un parón no se recupera lo perdido: se sigue a ritmo desde ahora
+            self.next_send = now + self.interval
+        return True
+
+
+def client_key(websocket):
+    address = getattr(websocket, "remote_address", None)
+    if address:
+        return f"{address[0]}:{address[1]}"
+    return str(id(websocket))
+
+
+def limit_socket_buffer(websocket, size):
+    """Keep at most about ``size`` unsent bytes in the kernel for this client.
+
+    Otherwise the socket's send buffer (autotuned up to several MB) soaks
+    up a stalled client's frames before the transport's own buffer grows,
+    and they reach it as history once it resumes. False if the transport
+    has no socket to tune.
+    """
+    try:
+        sock = websocket.transport.get_extra_info("socket")
+    except Exception:
+        sock = None
+    if sock is None:
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+        if hasattr(socket, "TCP_NOTSENT_LOWAT"):
+            # Linux/macOS: el socket sólo se da por escribible con menos de size bytes sin enviar
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, size)
+    except OSError:
+        return False
+    return True
+
+
+def _write_buffer_size(websocket):
+    try:
+        return websocket.transport.get_write_buffer_size()
+    except Exception:
+        return 0
+
+
+class Broadcaster:
+    """Fans frames out to clients grouped by wire format and subscription.
+
+    ``encoders`` maps each format to a factory: every group gets its own
+    encoder (delta state must follow what that group was actually sent).
+    Each frame is filtered and encoded at most once per group, and groups
+    die with their last client. Clients that keep up get frames written
+    straight to their transport. One whose transport holds more than
+    ``max_buffer`` bytes never queues history: it gets a latest-wins slot
+    and a lower adaptive rate (see ``ClientStats``); the kernel's send
+    buffer is capped to the same size so congestion shows up there. Serve with
+    ``write_limit=max_buffer`` so the drain waits for that same mark. With
+    ``metrics`` the encode time of every format is recorded.
+    """
+
+    def __init__(self, encoders, max_buffer=MAX_WRITE_BUFFER, metrics=None):
+        self.encoders = encoders
+        self.max_buffer = max_buffer
+        self.metrics = metrics
+        self.groups = {}  # (format, Subscription) -> Group
+        self.stats = {}
+
+    def __len__(self):
+        return len(self.stats)
+
+    def _join(self, websocket, fmt, subscription):
+        key = (fmt, subscription)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = Group(fmt, subscription, self.encoders[fmt]())
+        # Keyframe y alta en el grupo sin ceder el control: no se pierde ningún seq
+        keyframe = group.encoder.keyframe()
+        if keyframe:
+            websockets.broadcast([websocket], keyframe)
+        group.clients.add(websocket)
+        return group
+
+    def _leave(self, websocket, group):
+        group.clients.discard(websocket)
+        if not group.clients:
+            del self.groups[(group.format, group.subscription)]
+
+    def add(self, websocket, fmt):
+        # Con el buffer del kernel acotado, el atasco se ve en max_buffer a los pocos frames
+        limit_socket_buffer(websocket, self.max_buffer)
+        self.stats[websocket] = ClientStats(fmt, self._join(websocket, fmt, FULL))
+
+    def subscribe(self, websocket, subscription):
+        """Move a client to the group of ``subscription`` (its format doesn't change)."""
+        stats = self.stats.get(websocket)
+        if stats is None:
+            return
+        if stats.group.subscription == subscription:
+            return
+        self._leave(websocket, stats.group)
+        stats.group = self._join(websocket, stats.format, subscription)
+
+    def remove(self, websocket):
+        stats = self.stats.pop(websocket, None)
+        if stats is None:
+            return None
+        self._leave(websocket, stats.group)
+        if stats.task:
+            stats.task.cancel()
+        return stats
+
+    async def _drain(self, websocket, stats):
+        """Send the client's latest pending frame, at its adaptive rate, as its transport drains."""
+        loop = asyncio.get_running_loop()
+        try:
+            while stats.pending is not None:
+                now = loop.time()
+                if not stats.due(now):
+                    # Lo que llegue mientras tanto sustituye al frame del hueco
+                    await asyncio.sleep(stats.next_send - now)
+                    continue
+                if _write_buffer_size(websocket):
+                    # Aún no ha vaciado el envío anterior: tampoco aguanta este ritmo
+                    stats.congested(now)
+                payload, stats.pending = stats.pending, None
+                stats.count(payload)
+                # send() espera a que el buffer baje de la marca de write_limit
+                await websocket.send(payload)
+        except ConnectionClosed:
+            pass
+        finally:
+            stats.task = None
+
+    async def flush(self):
+        """Wait until every pending frame has been handed to its transport."""
+        tasks = [stats.task for stats in self.stats.values() if stats.task]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def publish(self, data, now):
+        """Encode and send one frame; returns how many clients it was written to."""
+        written = 0
+        if not data:
+            return written
+        for group in list(self.groups.values()):
+            if not group.due(now):
+                continue
+            encoder = group.encoder
+            filtered = group.subscription.filter(data, encoder.multi, encoder.fixed_layout)
+            if filtered is None:
+                continue
+            if self.metrics is None:
+                payload = encoder.encode(filtered, now)
+            else:
+                start = time.perf_counter()
+                payload = encoder.encode(filtered, now)
+                self.metrics.encode_histogram(group.format).observe(time.perf_counter() - start)
+            if payload is None:
+                continue
+
+            ready = []
+            keyframe = None
+            for websocket in group.clients:
+                stats = self.stats[websocket]
+                if stats.task:
+                    # Atascado: el hueco se queda sólo con el último frame
+                    if stats.pending is not None:
+                        stats.coalesced += 1
+                        stats.stale = True
+                elif not stats.due(now):
+                    stats.downsampled += 1
+                    stats.stale = True
+                    continue
+
+                message = payload
+                if stats.stale:
+                    # Tras saltarse frames un delta suelto no sirve: va el estado completo
+                    if keyframe is None:
+                        keyframe = encoder.keyframe() or payload
+                    message = keyframe
+
+                if stats.task:
+                    stats.pending = message
+                elif _write_buffer_size(websocket) > self.max_buffer:
+                    stats.pending = message
+                    stats.task = asyncio.create_task(self._drain(websocket, stats))
+                elif message is payload:
+                    stats.count(payload)
+                    ready.append(websocket)
+                else:
+                    stats.count(message)
+                    websockets.broadcast([websocket], message)
+                    written += 1
+
+            if ready:
+                websockets.broadcast(ready, payload)
+                written += len(ready)
+        return written
+
+    def send_all(self, message):
+        """Send a control message (e.g. metadata) to every client, whatever its format."""
+        if self.stats:
+            websockets.broadcast(self.stats.keys(), message)
+
+    def snapshot(self):
+        """Per-client counters, keyed by remote address."""
+        return {client_key(websocket): stats.as_dict() for websocket, stats in self.stats.items()}
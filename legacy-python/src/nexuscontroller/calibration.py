@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pygame
+
+CALIBRATION_SECONDS = 2.0
+SAMPLE_INTERVAL = 0.01
+
+# Un eje que en reposo está más allá de esto es un gatillo (descansa en un extremo)
+TRIGGER_REST_THRESHOLD = 0.5
+# Percentil de la desviación en reposo que se toma como suelo de ruido
+NOISE_PERCENTILE = 99
+
+
+def capture(joy, seconds=CALIBRATION_SECONDS, interval=SAMPLE_INTERVAL):
+    """Sample every axis of ``joy`` for ``seconds`` into an (n_samples, n_axes) array."""
+    n_axes = joy.get_numaxes()
+    n_samples = max(1, int(seconds / interval))
+    samples = np.empty((n_samples, n_axes), dtype=np.float64)
+
+    next_sample = time.perf_counter()
+    for k in range(n_samples):
+        pygame.event.pump()
+        samples[k] = [joy.get_axis(i) for i in range(n_axes)]
+        next_sample += interval
+        delay = next_sample - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return samples
+
+
+def analyze(samples):
+    """Per-axis statistics of a capture, all computed column-wise in one pass.
+
+    ``center`` is the median (robust to the odd spike, unlike a running
+    average), ``noise`` the NOISE_PERCENTILE of the absolute deviation from
+    it, ``min``/``max`` the observed travel and ``trigger`` the rest
+    position (-1/1) of axes that sit at an end, or 0 for centered axes.
+    """
+    center = np.median(samples, axis=0)
+    noise = np.percentile(np.abs(samples - center), NOISE_PERCENTILE, axis=0)
+    low = samples.min(axis=0)
+    high = samples.max(axis=0)
+    trigger = np.where(np.abs(center) > TRIGGER_REST_THRESHOLD, np.sign(center), 0.0)
+    return {"center": center, "noise": noise, "min": low, "max": high, "trigger": trigger}
+
+
+def _by_axis(values):
+    return {str(i): round(float(v), 6) for i, v in enumerate(values)}
+
+
+def to_profile(rest, travel=None):
+    """Profile fields from a rest analysis (and optionally a travel one).
+
+    ``baseline`` keeps the format ``InputSource`` already reads; the extra
+    statistics go under ``calibration``. Travel comes from the ``travel``
+    capture if given; a rest capture alone only bounds the noise. Sticks and
+    triggers get a linear ``processing`` entry whose deadzone is derived
+    from that noise (see processing.compile_processing).
+    """
+    span = travel if travel is not None else rest
+    return {
+        "baseline": _by_axis(rest["center"]),
+        "calibration": {
+            "noise": _by_axis(rest["noise"]),
+            "min": _by_axis(span["min"]),
+            "max": _by_axis(span["max"]),
+            "triggers": {str(i): int(v) for i, v in enumerate(rest["trigger"]) if v},
+            "travel": travel is not None,
+        },
+        "processing": {name: {} for name in ("left_stick", "right_stick", "trigger_left", "trigger_right")},
+    }
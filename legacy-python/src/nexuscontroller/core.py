@@ -1,21 +1,306 @@
 import json
 import os
-import pygame
 import struct
-from importlib import resources
+import sys
+import time
+
+from .plan import FIELDS, Frame, compile_profile
+# load_profile / load_default_profile viven en profiles; se reexportan aquí para quien ya los importaba de core
+from .profiles import PROFILE_CACHE_DIR, ProfileStore, load_default_profile, load_profile
 
 # Configuración headless
 os.environ.setdefault("SDL_JOYSTICK_ALLOW_BACKGROUND_EVENTS", "1")
 
+# Extras que pygame importa al cargarse y que un lector de mandos no usa:
+# numpy (surfarray/sndarray), pkg_resources (pkgdata) y PyOpenGL. Son ~85% de su import.
+# Sólo se saltan si el proceso lo pide con skip_pygame_extras() (lo hace nexus-server).
+PYGAME_SKIPPED_IMPORTS = ("numpy", "pkg_resources", "OpenGL")
+
+# Reintentos de conexión cuando no hay mando o falla al abrirlo
+RECONNECT_INITIAL = 0.5
+RECONNECT_MAX = 5.0
+
+# Eventos de conexión que devuelven los backends: (DEVICE_ADDED, índice) / (DEVICE_REMOVED, instance_id)
+DEVICE_ADDED = "added"
+DEVICE_REMOVED = "removed"
+
+# Un mando empaquetado por to_bytes: los 14 botones en un u16 y los 6 ejes en i16.
+# Lo comparten todos los formatos binarios (protocolo, UDP, grabaciones, memoria compartida)
+PAYLOAD = struct.Struct('<Hhhhhhh')
+PAYLOAD_SIZE = PAYLOAD.size
+# Índice de mando que precede al payload en UDP y memoria compartida
+PAD_HEADER = struct.Struct('<B')
+# Decimales de los ejes en los frames JSON
+JSON_DIGITS = 4
+
+
+_pygame = None
+_skip_pygame_extras = False
+_joy_events = None
+
+
+def skip_pygame_extras():
+    """Make ``load_pygame()`` import pygame without ``PYGAME_SKIPPED_IMPORTS``.
+
+    For processes that only read pads. The modules are hidden while pygame
+    imports, so they can still be imported afterwards. pygame's own
+    wrappers around them (``surfarray``, ``sndarray``, ``pkgdata``) are bound
+    at that point and stay unavailable for the rest of the process. Has no
+    effect once pygame is imported.
+    """
+    global _skip_pygame_extras
+    _skip_pygame_extras = True
+
+
+def load_pygame():
+    """Import pygame on first use (without its extras after ``skip_pygame_extras()``)."""
+    global _pygame
+    if _pygame is None:
+        hidden = [name for name in PYGAME_SKIPPED_IMPORTS if name not in sys.modules] if _skip_pygame_extras else []
+        for name in hidden:
+            sys.modules[name] = None
+        try:
+            import pygame
+        finally:
+            for name in hidden:
+                if sys.modules.get(name, ...) is None:
+                    del sys.modules[name]
+        _pygame = pygame
+    return _pygame
+
 
-class InputSource:
-    def __init__(self, config_path=None):
-        pygame.init()
+def wall_clock(read_at):
+    """UNIX time of ``read_at``, a ``time.monotonic()`` instant."""
+    return time.time() - (time.monotonic() - read_at)
+
+
+def rounded(data):
+    """``data`` with its floats rounded to ``JSON_DIGITS`` for a JSON frame."""
+    return {k: round(v, JSON_DIGITS) if isinstance(v, float) else v for k, v in data.items()}
+
+
+def joy_events():
+    """``(input, device)`` event types: state changes of a pad, and pads (dis)connecting."""
+    global _joy_events
+    if _joy_events is None:
+        pygame = load_pygame()
+        _joy_events = (
+            (pygame.JOYAXISMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYHATMOTION),
+            (pygame.JOYDEVICEADDED, pygame.JOYDEVICEREMOVED),
+        )
+    return _joy_events
+
+
+def ignore_input_events():
+    """Polling reads state directly: don't queue axis/button events nobody consumes.
+
+    Otherwise they fill SDL's queue and device add/remove events get dropped.
+    """
+    input_events, _ = joy_events()
+    load_pygame().event.set_blocked(list(input_events))
+
+
+def listen_joy_events():
+    """Restrict the SDL queue to joystick events (event-driven mode)."""
+    pygame = load_pygame()
+    input_events, device_events = joy_events()
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(list(input_events + device_events))
+    pygame.event.clear()
+
+
+def wait_for_joy_event(timeout):
+    """Block up to ``timeout`` seconds for joystick activity.
+
+    Returns True if something changed. The burst is drained from the queue:
+    ``read()`` samples the final state, so only the fact that it changed matters.
+    """
+    pygame = load_pygame()
+    input_events, device_events = joy_events()
+    event = pygame.event.wait(max(1, int(timeout * 1000)))
+    if event.type == pygame.NOEVENT:
+        return False
+    if event.type in device_events:
+        # Los de conexión se los queda read() para el hot-plug
+        pygame.event.post(event)
+    pygame.event.get(input_events)
+    return True
+
+
+class Backend:
+    """Where joysticks come from: SDL, a script, a recording...
+
+    Joysticks are duck-typed like ``pygame.joystick.Joystick`` (``init``,
+    ``quit``, ``get_axis``, ``get_button``, ``get_hat``, ``get_name``,
+    ``get_guid``, ``get_instance_id``). ``device_events()`` also advances
+    the backend's state (the SDL pump), once per read.
+    """
+
+    def init(self):
+        pass
+
+    def count(self):
+        raise NotImplementedError
+
+    def open(self, index):
+        """Joystick at ``index``; the caller ``init()``s it if it keeps it."""
+        raise NotImplementedError
+
+    def device_events(self):
+        return []
+
+    def profile_for(self, joystick):
+        """Profile the backend imposes on ``joystick``, or None to use the configured one."""
+        return None
+
+    def quit(self):
+        pass
+
+
+class PygameBackend(Backend):
+    """Real pads through SDL.
+
+    Only the subsystems a headless reader needs are started: joystick, and
+    video on SDL's dummy driver (pygame's event queue requires it), unless
+    ``SDL_VIDEODRIVER`` says otherwise. ``pygame.init()`` would also bring
+    up audio, fonts and the mixer.
+    """
+
+    def __init__(self):
+        self.pygame = None
+        self.device_types = ()
+
+    def init(self):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame = self.pygame = load_pygame()
+        pygame.display.init()
         pygame.joystick.init()
+        self.device_types = joy_events()[1]
+        ignore_input_events()
+
+    def count(self):
+        return self.pygame.joystick.get_count()
+
+    def open(self, index):
+        return self.pygame.joystick.Joystick(index)
+
+    def device_events(self):
+        pygame = self.pygame
+        # event.get() también hace el pump de SDL
+        return [
+            (DEVICE_REMOVED, event.instance_id) if event.type == pygame.JOYDEVICEREMOVED
+            else (DEVICE_ADDED, event.device_index)
+            for event in pygame.event.get(self.device_types)
+        ]
+
+    def quit(self):
+        try:
+            self.pygame.quit()
+        except Exception:
+            pass
+
+
+class Backoff:
+    """Exponential retry timer for reconnect attempts."""
+
+    def __init__(self, initial=RECONNECT_INITIAL, maximum=RECONNECT_MAX):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = initial
+        self.next_try = 0.0
+
+    def ready(self, now):
+        return now >= self.next_try
+
+    def fail(self, now):
+        self.next_try = now + self.delay
+        self.delay = min(self.delay * 2, self.maximum)
+
+    def reset(self):
+        self.delay = self.initial
+        self.next_try = 0.0
+
+
+class Pad:
+    """An opened joystick plus the profile used to read it."""
+
+    def __init__(self, joystick, mapping=None, player=0, plan=None):
+        self.joystick = joystick
+        self.mapping = mapping or {}
+        # Con un plan ya compilado (ProfileStore) conectar un mando no compila nada.
+        # Plan y frame van juntos: apply() los cambia con una sola asignación
+        self._state = (plan if plan is not None else compile_profile(self.mapping), Frame())
+        self.player = player
+
+        self.name = joystick.get_name()
+        try:
+            self.guid = joystick.get_guid()
+        except Exception:
+            self.guid = None
+        try:
+            self.instance_id = joystick.get_instance_id()
+        except Exception:
+            self.instance_id = None
+
+        if self.mapping and self.guid and self.guid != self.mapping.get("guid"):
+            print(f"⚠️ AVISO: GUID no coincide. Esperado: {self.mapping.get('guid')}")
+
+    def apply(self, profile):
+        """Switch to ``profile`` (a ``CompiledProfile``) between reads. False if nothing changes."""
+        if profile.profile == self.mapping:
+            return False
+        self.mapping = profile.profile
+        # Frame nuevo: los campos que el perfil nuevo ya no lee no pueden quedarse con su último valor.
+        # Una sola asignación: una lectura en otro hilo ve el par viejo o el nuevo, nunca mezclados
+        self._state = (profile.plan, Frame())
+        return True
+
+    @property
+    def plan(self):
+        return self._state[0]
+
+    def info(self):
+        return {
+            "connected": True,
+            "name": self.name,
+            "guid": self.guid,
+            "index": self.instance_id,
+            "player": self.player,
+            "profile": self.mapping.get("name")
+        }
+
+    def close(self):
+        try:
+            self.joystick.quit()
+        except Exception:
+            pass
+
+    def read_into(self, frame):
+        """Fill a preallocated ``Frame`` in place (no per-tick allocation).
+
+        Only the fields the current plan maps are written: after ``apply()``
+        pass a fresh ``Frame`` so unmapped ones don't keep old values.
+        """
+        plan, _ = self._state
+        plan.run(self.joystick, frame.values)
+        return frame
+
+    def read(self):
+        # El pump de eventos lo hace el dueño del Pad (InputSource / DeviceManager)
+        plan, frame = self._state
+        return dict(zip(FIELDS, plan.run(self.joystick, frame.values)))
+
+
+class InputSource:
+    def __init__(self, config_path=None, backend=None, profile_cache=PROFILE_CACHE_DIR, gamecontrollerdb=()):
+        self.backend = backend or PygameBackend()
+        self.backend.init()
 
         self.joystick = None
-        self.mapping = {}
-        self.baseline = {}
+        self.pad = None
+        # Sube con cada conexión/desconexión para que el servidor reenvíe los metadatos
+        self.metadata_version = 0
+        self._backoff = Backoff()
 
         self.device_info = {
             "connected": False,
@@ -24,67 +309,57 @@ class InputSource:
             "index": -1
         }
 
-        # Cargar configuración: si no se pasa ruta, usar default_config.json del paquete
-        if config_path:
-            abs_path = os.path.abspath(config_path)
-            print(f"📂 Configuración: {abs_path}")
-            self._load_config(config_path)
-        else:
-            try:
-                # resources.files requires a package; using package-relative resource
-                with resources.as_file(resources.files(__package__).joinpath("default_config.json")) as p:
-                    print(f"📂 Usando configuración por defecto del paquete: {p}")
-                    self._load_config(str(p))
-            except Exception as e:
-                print(f"⚠️ No se pudo cargar default_config.json desde el paquete: {e}")
+        # Perfiles: config_path es un JSON o un directorio indexado por GUID; sin él, el del paquete
+        self.profiles = ProfileStore(config_path, profile_cache, gamecontrollerdb)
 
         self._try_connect()
 
-    def _load_config(self, filename):
-        if not os.path.exists(filename):
-            print(f"⚠️ ERROR: No existe {filename}")
-            return
-
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.mapping = data
-                self.baseline = {int(k): v for k, v in data.get("baseline", {}).items()}
-                print(f"✅ Perfil cargado: {data.get('name', 'Unknown')}")
-        except Exception as e:
-            print(f"❌ Error JSON: {e}")
-
-    def _try_connect(self):
-        if pygame.joystick.get_count() > 0:
+    def _try_connect(self, index=0):
+        if self.backend.count() > index:
             try:
-                self.joystick = pygame.joystick.Joystick(0)
+                self.joystick = self.backend.open(index)
                 self.joystick.init()
-
-                name = self.joystick.get_name()
-                try:
-                    guid = self.joystick.get_guid()
-                except Exception:
-                    guid = None
-
-                if self.mapping and guid and guid != self.mapping.get("guid"):
-                    print(f"⚠️ AVISO: GUID no coincide. Esperado: {self.mapping.get('guid')}")
+                profile = self.profiles.for_joystick(self.joystick, self.backend)
+                self.pad = Pad(self.joystick, profile.profile, plan=profile.plan)
 
                 self.device_info = {
                     "connected": True,
-                    "name": name,
-                    "guid": guid,
-                    "index": 0
+                    "name": self.pad.name,
+                    "guid": self.pad.guid,
+                    "index": index,
+                    "profile": self.pad.mapping.get("name")
                 }
-                print(f"🔌 Mando conectado: {name}")
+                self.metadata_version += 1
+                self._backoff.reset()
+                print(f"🔌 Mando conectado: {self.pad.name}")
                 return True
             except Exception as e:
+                self.joystick = None
+                self.pad = None
                 print(f"❌ Error conexión: {e}")
                 return False
         return False
 
+    def swap_profiles(self, profiles):
+        """Switch to a reloaded ``ProfileStore``. Returns how many open pads changed profile."""
+        self.profiles = profiles
+        # Con --input-thread el mando puede desconectarse a mitad: se trabaja con el de ahora
+        pad = self.pad
+        if not pad or not pad.apply(profiles.for_joystick(pad.joystick, self.backend)):
+            return 0
+        self.device_info = dict(self.device_info, profile=pad.mapping.get("name"))
+        self.metadata_version += 1
+        return 1
+
+    def _disconnect(self):
+        print(f"🔌 Mando desconectado: {self.pad.name}")
+        self.pad.close()
+        self.joystick = None
+        self.pad = None
+        self.device_info = dict(self.device_info, connected=False)
+        self.metadata_version += 1
+
     def get_metadata_json(self) -> str:
-        if not self.joystick:
-            self._try_connect()
         return json.dumps(self.device_info, indent=2)
 
     def close(self):
@@ -93,97 +368,37 @@ class InputSource:
                 self.joystick.quit()
             except Exception:
                 pass
-        try:
-            pygame.quit()
-        except Exception:
-            pass
+        self.backend.quit()
 
-    # --- HELPERS DE LECTURA ---
+    def _handle_device_events(self):
+        for kind, value in self.backend.device_events():
+            if kind == DEVICE_REMOVED:
+                if self.pad and value == self.pad.instance_id:
+                    self._disconnect()
+                    self._backoff.reset()
+            elif not self.joystick:
+                self._try_connect(value)
 
-    def _get_axis_corrected(self, semantic_name):
-        if not self.joystick:
-            return 0.0
-        axis_id = self.mapping.get("axes", {}).get(semantic_name)
-        if axis_id is None:
-            return 0.0
+    def _poll(self):
+        """Pump SDL and handle hot-plug. Returns the Pad or None."""
+        self._handle_device_events()
 
-        raw_val = self.joystick.get_axis(axis_id)
-        base = self.baseline.get(axis_id, 0.0)
-        corrected = raw_val - base
-        return max(-1.0, min(1.0, corrected))
-
-    def _get_button_mapped(self, semantic_name):
         if not self.joystick:
-            return 0
-        btn_id = self.mapping.get("buttons", {}).get(semantic_name)
-        if btn_id is None:
-            return 0
-        return 1 if self.joystick.get_button(btn_id) else 0
+            # Sin eventos de conexión sólo se reintenta con backoff, no en cada tick
+            now = time.monotonic()
+            if self._backoff.ready(now) and not self._try_connect():
+                self._backoff.fail(now)
 
-    def _get_dpad_state(self):
-        res = {"up": 0, "down": 0, "left": 0, "right": 0}
-        if not self.joystick:
-            return res
-
-        hat_id = self.mapping.get("hats", {}).get("dpad")
-        if hat_id is None:
-            return res
-
-        dx, dy = self.joystick.get_hat(hat_id)
-
-        if dy == 1:
-            res["up"] = 1
-        if dy == -1:
-            res["down"] = 1
-        if dx == -1:
-            res["left"] = 1
-        if dx == 1:
-            res["right"] = 1
-        return res
+        return self.pad
 
     def read(self):
-        pygame.event.pump()
+        pad = self._poll()
+        return pad.read() if pad else None
 
-        if not self.joystick:
-            self._try_connect()
-            if not self.joystick:
-                return None
-
-        if pygame.joystick.get_count() == 0:
-            try:
-                self.joystick.quit()
-            except Exception:
-                pass
-            self.joystick = None
-            self.device_info["connected"] = False
-            return None
-
-        d = {
-            "a": self._get_button_mapped("face_bottom"),
-            "b": self._get_button_mapped("face_right"),
-            "x": self._get_button_mapped("face_left"),
-            "y": self._get_button_mapped("face_top"),
-            "lb": self._get_button_mapped("shoulder_left"),
-            "rb": self._get_button_mapped("shoulder_right"),
-            "back": self._get_button_mapped("select"),
-            "start": self._get_button_mapped("start"),
-            "l3": self._get_button_mapped("thumbl"),
-            "r3": self._get_button_mapped("thumbr"),
-        }
-
-        dpad = self._get_dpad_state()
-        d.update(dpad)
-
-        d.update({
-            "lx": self._get_axis_corrected("left_stick_x"),
-            "ly": self._get_axis_corrected("left_stick_y"),
-            "rx": self._get_axis_corrected("right_stick_x"),
-            "ry": self._get_axis_corrected("right_stick_y"),
-            "lt": self._get_axis_corrected("trigger_left"),
-            "rt": self._get_axis_corrected("trigger_right")
-        })
-
-        return d
+    def read_into(self, frame):
+        """Like ``read()`` but fills a preallocated ``Frame`` in place."""
+        pad = self._poll()
+        return pad.read_into(frame) if pad else None
 
     @staticmethod
     def to_bytes(data: dict) -> bytes:
@@ -201,17 +416,23 @@ class InputSource:
         def f2i(val):
             return int(max(-1.0, min(1.0, val)) * 32767)
 
-        return struct.pack(
-            '<Hhhhhhh',
+        return PAYLOAD.pack(
             buttons_bits,
             f2i(data["lx"]), f2i(data["ly"]), f2i(data["rx"]), f2i(data["ry"]),
-            f2i(data["lt"]), f2i(data["rt"]) 
+            f2i(data["lt"]), f2i(data["rt"])
         )
 
+    @staticmethod
+    def from_bytes(payload: bytes) -> dict:
+        """Inverse of ``to_bytes`` (axes come back quantized to 1/32767)."""
+        buttons_bits, *axes = PAYLOAD.unpack(payload)
+        d = {name: (buttons_bits >> bit) & 1 for bit, name in enumerate(FIELDS[:14])}
+        d.update({name: v / 32767 for name, v in zip(FIELDS[14:], axes)})
+        return d
+
     @staticmethod
     def to_json(data: dict) -> str:
-        clean = {k: round(v, 4) if isinstance(v, float) else v for k, v in data.items()}
-        return json.dumps(clean)
+        return json.dumps(rounded(data))
 
 
 if __name__ == "__main__":
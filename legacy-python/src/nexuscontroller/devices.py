@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+
+from .core import DEVICE_REMOVED, Backoff, Pad, PygameBackend, rounded
+from .profiles import PROFILE_CACHE_DIR, ProfileStore
+
+MAX_PLAYERS = 8
+# Los formatos binarios (protocolo, UDP, grabaciones, memoria compartida) guardan el índice
+# del mando y el nº de mandos en un byte
+PLAYER_LIMIT = 255
+
+
+class DeviceManager:
+    """Opens every attached joystick and reads them all in one pass.
+
+    ``read()`` may run on the input thread while the event loop builds the
+    metadata or swaps profiles: ``pads`` only changes under ``_lock``, and
+    everyone else iterates a snapshot taken under it.
+    """
+
+    def __init__(self, config_path=None, max_players=MAX_PLAYERS, backend=None, profile_cache=PROFILE_CACHE_DIR,
+                 gamecontrollerdb=()):
+        if not 0 < max_players <= PLAYER_LIMIT:
+            raise ValueError(f"max_players debe estar entre 1 y {PLAYER_LIMIT}, no {max_players}")
+        self.backend = backend or PygameBackend()
+        self.backend.init()
+
+        self.max_players = max_players
+        self.profiles = ProfileStore(config_path, profile_cache, gamecontrollerdb)
+        self.pads = {}  # instance_id -> Pad
+        self._lock = threading.Lock()
+        # Sube con cada conexión/desconexión para que el servidor reenvíe los metadatos
+        self.metadata_version = 0
+        # Sólo se reescanea con backoff si un mando no se pudo abrir
+        self._backoff = Backoff()
+        self._retry = False
+
+        self.scan()
+
+    def swap_profiles(self, profiles):
+        """Switch to a reloaded ``ProfileStore``. Returns how many open pads changed profile."""
+        with self._lock:
+            # Bajo el lock: un mando que se esté abriendo usa el perfil nuevo o entra en la lista
+            self.profiles = profiles
+            pads = list(self.pads.values())
+        changed = sum(pad.apply(profiles.for_joystick(pad.joystick, self.backend)) for pad in pads)
+        if changed:
+            with self._lock:
+                self.metadata_version += 1
+        return changed
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self.pads.values())
+
+    def _free_player(self):
+        used = {pad.player for pad in self.pads.values()}
+        for player in range(self.max_players):
+            if player not in used:
+                return player
+        return None
+
+    def _open(self, index):
+        """Open joystick ``index`` unless already open. False if it should be retried."""
+        try:
+            joystick = self.backend.open(index)
+            instance_id = joystick.get_instance_id()
+        except Exception as e:
+            print(f"❌ Error conexión: {e}")
+            return False
+
+        if instance_id in self.pads:
+            return True
+
+        player = self._free_player()
+        if player is None:
+            print(f"⚠️ Sin hueco libre para {joystick.get_name()} (máx. {self.max_players})")
+            return False
+
+        try:
+            joystick.init()
+        except Exception as e:
+            print(f"❌ Error conexión: {e}")
+            return False
+
+        with self._lock:
+            try:
+                profile = self.profiles.for_joystick(joystick, self.backend)
+                pad = Pad(joystick, profile.profile, player, profile.plan)
+            except Exception as e:
+                print(f"❌ Error conexión: {e}")
+                return False
+            self.pads[instance_id] = pad
+            self.metadata_version += 1
+        print(f"🔌 Mando conectado: {pad.name} -> Jugador {player + 1}")
+        return True
+
+    def _remove(self, instance_id):
+        with self._lock:
+            pad = self.pads.pop(instance_id, None)
+            if pad is None:
+                return
+            self.metadata_version += 1
+        pad.close()
+        print(f"🔌 Mando desconectado: {pad.name} (Jugador {pad.player + 1})")
+        # Puede haber quedado hueco para un mando que antes no cabía
+        self._retry = self._retry or self.backend.count() > len(self.pads)
+
+    def scan(self):
+        """Open every joystick SDL currently reports. Returns False if any failed."""
+        ok = True
+        for index in range(self.backend.count()):
+            ok = self._open(index) and ok
+        self._retry = not ok
+        return ok
+
+    def _handle_device_events(self):
+        for kind, value in self.backend.device_events():
+            if kind == DEVICE_REMOVED:
+                self._remove(value)
+            elif not self._open(value):
+                self._retry = True
+
+        if self._retry:
+            now = time.monotonic()
+            if self._backoff.ready(now):
+                if self.scan():
+                    self._backoff.reset()
+                else:
+                    self._backoff.fail(now)
+
+    @property
+    def device_info(self):
+        pads = sorted(self._snapshot(), key=lambda p: p.player)
+        return {
+            "connected": bool(pads),
+            "name": pads[0].name if pads else "No Device",
+            "pads": [pad.info() for pad in pads]
+        }
+
+    def get_metadata_json(self) -> str:
+        return json.dumps(self.device_info, indent=2)
+
+    def read(self):
+        """Read every pad. Returns a list of frames, each tagged with ``player``."""
+        self._handle_device_events()
+
+        frames = []
+        for pad in self._snapshot():
+            d = pad.read()
+            d["player"] = pad.player
+            frames.append(d)
+        return frames
+
+    def close(self):
+        with self._lock:
+            pads = list(self.pads.values())
+            self.pads.clear()
+        for pad in pads:
+            pad.close()
+        self.backend.quit()
+
+    @staticmethod
+    def to_json(frames: list) -> str:
+        return json.dumps({"pads": [rounded(d) for d in frames]})
@@ -0,0 +1,128 @@
+"""SDL ``gamecontrollerdb.txt`` mappings as NexusController profiles.
+
+Each line is ``GUID,name,field:binding,...,platform:<OS>,`` where a
+binding is ``bN`` (button), ``aN`` (axis) or ``hN.M`` (hat N, bit M).
+Files are parsed into a GUID index up front; a line only becomes a
+profile (``to_profile``) when a pad with that GUID shows up.
+"""
+import sys
+
+# Campo de SDL -> nombre semántico en el perfil JSON
+SDL_BUTTONS = {
+    "a": "face_bottom", "b": "face_right", "x": "face_left", "y": "face_top",
+    "leftshoulder": "shoulder_left", "rightshoulder": "shoulder_right",
+    "back": "select", "start": "start",
+    "leftstick": "thumbl", "rightstick": "thumbr",
+}
+SDL_AXES = {
+    "leftx": "left_stick_x", "lefty": "left_stick_y",
+    "rightx": "right_stick_x", "righty": "right_stick_y",
+    "lefttrigger": "trigger_left", "righttrigger": "trigger_right",
+}
+SDL_TRIGGERS = ("lefttrigger", "righttrigger")
+SDL_DPAD = ("dpup", "dpdown", "dpleft", "dpright")
+
+# Valor de sys.platform -> el de la clave "platform:" de gamecontrollerdb
+PLATFORMS = {"linux": "Linux", "win32": "Windows", "darwin": "Mac OS X"}
+
+
+def current_platform():
+    return PLATFORMS.get(sys.platform, sys.platform)
+
+
+def normalize_guid(guid):
+    """GUID without SDL's name CRC (hex 4-8), which newer SDL fills in and the db leaves at 0.
+
+    SDL itself ignores it when matching mappings.
+    """
+    guid = guid.lower()
+    return guid[:4] + "0000" + guid[8:] if len(guid) == 32 else guid
+
+
+def parse_line(line):
+    """``(guid, name, {field: binding})`` for one mapping line, or None for comments/blank lines."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    parts = line.rstrip(",").split(",")
+    if len(parts) < 2 or len(parts[0]) != 32:
+        return None
+    fields = {}
+    for part in parts[2:]:
+        key, sep, value = part.partition(":")
+        if sep:
+            fields[key.strip()] = value.strip()
+    return parts[0], parts[1], fields
+
+
+def load(paths, platform=None):
+    """Index the mappings of ``paths`` by normalized GUID, for ``platform`` (default: this OS).
+
+    Lines for another platform are skipped; a line without ``platform``
+    applies everywhere, but one for this platform wins over it. Later
+    files override earlier ones, as with SDL's own hint.
+    """
+    platform = platform or current_platform()
+    index = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parsed = parse_line(line)
+                if parsed is None:
+                    continue
+                guid, name, fields = parsed
+                line_platform = fields.get("platform")
+                if line_platform and line_platform != platform:
+                    continue
+                key = normalize_guid(guid)
+                previous = index.get(key)
+                if line_platform or previous is None or not previous[1].get("platform"):
+                    index[key] = (name, fields)
+    return index
+
+
+def _index(binding, prefix):
+    """``N`` for a plain ``<prefix>N`` binding; None for anything else (half axes, inverted, other kind)."""
+    if binding.startswith(prefix) and binding[len(prefix):].isdigit():
+        return int(binding[len(prefix):])
+    return None
+
+
+def to_profile(name, fields, guid=None):
+    """Profile dict (``buttons``/``axes``/``hats``) equivalent to a gamecontrollerdb line.
+
+    Only what the profile schema can express is kept: buttons on buttons,
+    sticks and triggers on full axes, and a d-pad on a hat. Triggers rest
+    at -1 in the raw axis (SDL rescales them to 0..1), so they get that
+    baseline and a calibrated travel of -1..1, which ``compile_profile``
+    turns into a 0..1 output.
+    """
+    buttons = {}
+    for field, semantic in SDL_BUTTONS.items():
+        index = _index(fields.get(field, ""), "b")
+        if index is not None:
+            buttons[semantic] = index
+
+    axes = {}
+    for field, semantic in SDL_AXES.items():
+        index = _index(fields.get(field, ""), "a")
+        if index is not None:
+            axes[semantic] = index
+
+    profile = {"name": name, "guid": guid, "source": "gamecontrollerdb", "buttons": buttons, "axes": axes}
+
+    hats = {fields.get(field, "").partition(".")[0] for field in SDL_DPAD if fields.get(field, "").startswith("h")}
+    if len(hats) == 1:
+        hat = _index(hats.pop(), "h")
+        if hat is not None:
+            profile["hats"] = {"dpad": hat}
+
+    triggers = [axes[SDL_AXES[field]] for field in SDL_TRIGGERS if SDL_AXES[field] in axes]
+    if triggers:
+        profile["baseline"] = {str(index): -1.0 for index in triggers}
+        profile["calibration"] = {
+            "min": {str(index): -1.0 for index in triggers},
+            "max": {str(index): 1.0 for index in triggers},
+            "travel": True,
+        }
+    return profile
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+from .scheduler import TickStats
+
+RING_SIZE = 64
+# Sin mando no hay nada que muestrear: se espera esto entre lecturas
+IDLE_POLL = 0.25
+
+
+class FrameRing:
+    """Single-producer ring buffer of ``(seq, timestamp, data)`` entries.
+
+    Only the input thread writes. The slot is filled before ``seq`` is
+    advanced, and both are single reference assignments (atomic under the
+    GIL), so readers never need a lock. Keeping older slots means the entry
+    a reader holds is not overwritten by the very next push.
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.slots = [None] * size
+        self.seq = 0
+
+    def push(self, timestamp, data):
+        seq = self.seq + 1
+        self.slots[seq % self.size] = (seq, timestamp, data)
+        self.seq = seq
+
+    def latest(self):
+        seq = self.seq
+        if not seq:
+            return None
+        return self.slots[seq % self.size]
+
+
+class InputThread:
+    """Samples ``source.read()`` on its own thread at a fixed rate.
+
+    SDL pumping and joystick getters run off the asyncio loop, so a slow
+    SDL call can't stall handshakes or sends. Each frame is timestamped
+    with ``time.monotonic()`` (same clock as ``loop.time()``) when its read
+    starts and pushed to a ``FrameRing``; the loop is woken through
+    ``call_soon_threadsafe``. ``read_time`` (a ``metrics.Histogram``) gets
+    the duration of every read; ticks are accounted by a ``TickStats``, as
+    in ``TickScheduler``.
+    """
+
+    def __init__(self, source, rate, ring_size=RING_SIZE, read_time=None, lateness=None):
+        self.source = source
+        self.read_time = read_time
+        self.period = 1.0 / rate
+        self.ring = FrameRing(ring_size)
+        self.stats = TickStats(rate, lateness)
+
+        self._loop = None
+        self._ready = None
+        self._pending = False
+        self._running = False
+        self._thread = None
+        self._last_seq = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="nexus-input", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _notify(self):
+        self._pending = False
+        self._ready.set()
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self._running:
+            start = time.monotonic()
+            data = self.source.read()
+            if self.read_time is not None:
+                self.read_time.observe(time.monotonic() - start)
+            self.ring.push(start, data)
+
+            # Una sola notificación en vuelo: si el loop va atrasado, leerá el último frame
+            if not self._pending:
+                self._pending = True
+                self._loop.call_soon_threadsafe(self._notify)
+
+            if not data:
+                time.sleep(IDLE_POLL)
+                next_tick = time.monotonic()
+                continue
+
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            next_tick += self.stats.record(time.monotonic() - next_tick) * self.period
+
+    def snapshot(self, reset=False):
+        # Lo pide el loop mientras el hilo cuenta: como mucho se pierde una muestra del intervalo
+        return self.stats.snapshot(reset)
+
+    async def next_frame(self):
+        """Wait for a frame newer than the last one returned: ``(timestamp, data)``."""
+        while self.ring.seq == self._last_seq:
+            self._ready.clear()
+            await self._ready.wait()
+        seq, timestamp, data = self.ring.latest()
+        self._last_seq = seq
+        return timestamp, data
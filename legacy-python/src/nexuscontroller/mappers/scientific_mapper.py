@@ -5,6 +5,7 @@ import sys
 
 HOLD_TIME = 0.8
 DELTA_THRESHOLD = 0.6
+TRAVEL_SECONDS = 5.0
 
 BUTTON_TARGETS = [
     "face_bottom", "face_right", "face_left", "face_top",
@@ -19,28 +20,39 @@ AXIS_TARGETS = [
     "trigger_left", "trigger_right"
 ]
 
+def _calibration():
+    """nexuscontroller.calibration, which needs numpy (extra "mapper"); imported on first use."""
+    try:
+        from nexuscontroller import calibration
+    except ModuleNotFoundError as e:
+        if e.name != "numpy":
+            raise
+        sys.exit("❌ nexus-map necesita numpy: pip install 'nexuscontroller[mapper]'")
+    return calibration
+
 def clear_line():
     sys.stdout.write("\033[K")
     sys.stdout.write("\r")
 
 def get_baseline(joy):
     print("\n⚖️  CALIBRANDO SENSORES (NO TOQUES NADA)...")
-    baseline = {}
-    for _ in range(20):
-        pygame.event.pump()
-        for i in range(joy.get_numaxes()):
-            val = joy.get_axis(i)
-            if i in baseline:
-                baseline[i] = (baseline[i] + val) / 2
-            else:
-                baseline[i] = val
-        time.sleep(0.05)
+    rest = _calibration().analyze(_calibration().capture(joy))
+    baseline = {i: float(val) for i, val in enumerate(rest["center"])}
     print("✅ Calibración terminada. Valores de reposo detectados:")
     for i, val in baseline.items():
-        if abs(val) > 0.1:
+        if rest["trigger"][i]:
             print(f"   - Eje {i} descansa en {val:.2f} (Probable Gatillo)")
+        print(f"   - Eje {i}: ruido ±{rest['noise'][i]:.4f}")
+    print("-" * 50)
+    return baseline, rest
+
+def get_travel(joy):
+    print(f"\n🔄 MUEVE LOS STICKS EN CÍRCULOS Y APRIETA LOS GATILLOS A FONDO ({TRAVEL_SECONDS:.0f} s)...")
+    travel = _calibration().analyze(_calibration().capture(joy, TRAVEL_SECONDS))
+    for i in range(len(travel["min"])):
+        print(f"   - Eje {i}: recorrido {travel['min'][i]:.2f} .. {travel['max'][i]:.2f}")
     print("-" * 50)
-    return baseline
+    return travel
 
 def wait_for_neutral(joy, baseline):
     print("   ✋ Suelta los controles...", end="\r")
@@ -62,6 +74,8 @@ def wait_for_neutral(joy, baseline):
     clear_line()
 
 def scientific_mapper():
+    # Antes de tocar el mando: sin numpy no se puede calibrar
+    _calibration()
     pygame.init()
     pygame.joystick.init()
 
@@ -71,7 +85,8 @@ def scientific_mapper():
 
     joy = pygame.joystick.Joystick(0)
     joy.init()
-    baseline = get_baseline(joy)
+    baseline, rest = get_baseline(joy)
+    travel = get_travel(joy)
 
     mapping = {
         "name": joy.get_name(),
@@ -79,8 +94,8 @@ def scientific_mapper():
         "buttons": {},
         "axes": {},
         "hats": {},
-        "baseline": baseline
     }
+    mapping.update(_calibration().to_profile(rest, travel))
 
     for target in BUTTON_TARGETS:
         wait_for_neutral(joy, baseline)
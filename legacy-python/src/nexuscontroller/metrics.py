@@ -0,0 +1,154 @@
+import bisect
+
+# Límites de los buckets en segundos (de 10 µs a 1 s), el último implícito es +Inf
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+QUANTILES = (0.5, 0.99)
+
+METRICS_PATH = "/metrics"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+class Histogram:
+    """Fixed-bucket histogram: ``observe()`` is one bisect and two adds.
+
+    Quantiles are estimated by interpolating inside the bucket that holds
+    them, which is as precise as the bucket layout and never stores samples.
+    """
+
+    __slots__ = ("labels", "counts", "count", "sum")
+
+    def __init__(self, labels=None):
+        self.labels = labels or {}
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+    def summary(self):
+        """p50/p99 and mean in milliseconds, for the JSON stats reply and logs."""
+        stats = {f"p{int(q * 100)}_ms": round(self.quantile(q) * 1000, 3) for q in QUANTILES}
+        stats["avg_ms"] = round(self.sum / self.count * 1000, 3) if self.count else 0.0
+        stats["count"] = self.count
+        return stats
+
+    def render(self, name):
+        lines = []
+        labels = self.labels
+        cumulative = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': repr(bound)})} {cumulative}")
+        lines.append(f"{name}_bucket{_labels({**labels, 'le': '+Inf'})} {self.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {self.sum!r}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+class Metrics:
+    """Server-side timings of the input -> wire path.
+
+    ``read``: ``source.read()`` (SDL pump + getters). ``encode``: one
+    histogram per wire format. ``lateness``: how late each tick woke up
+    vs. its deadline. ``latency``: from the moment the frame was read to
+    the end of its broadcast. ``render()`` writes everything, plus the
+    per-client counters of the broadcaster and the UDP output, in
+    Prometheus text format.
+    """
+
+    def __init__(self):
+        self.read = Histogram()
+        self.encode = {}
+        self.lateness = Histogram()
+        self.latency = Histogram()
+
+    def encode_histogram(self, fmt):
+        histogram = self.encode.get(fmt)
+        if histogram is None:
+            histogram = self.encode[fmt] = Histogram({"format": fmt})
+        return histogram
+
+    def _histograms(self):
+        yield "nexus_read_seconds", "Duración de source.read() (pump SDL + lectura)", [self.read]
+        yield "nexus_encode_seconds", "Duración de la codificación de un frame por formato", list(self.encode.values())
+        yield "nexus_tick_lateness_seconds", "Retraso de cada tick respecto a su deadline", [self.lateness]
+        yield "nexus_frame_latency_seconds", "De la lectura del mando al final del envío", [self.latency]
+
+    def summary(self):
+        stats = {"read": self.read.summary(), "lateness": self.lateness.summary(),
+                 "latency": self.latency.summary()}
+        stats["encode"] = {fmt: h.summary() for fmt, h in self.encode.items()}
+        return stats
+
+    def render(self, broadcaster=None, gate=None, udp=None):
+        lines = []
+        for name, doc, histograms in self._histograms():
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} histogram")
+            for histogram in histograms:
+                lines.extend(histogram.render(name))
+
+            quantile = f"{name}_quantile"
+            lines.append(f"# HELP {quantile} Estimación de p50/p99 a partir de los buckets")
+            lines.append(f"# TYPE {quantile} gauge")
+            for histogram in histograms:
+                for q in QUANTILES:
+                    labels = _labels({**histogram.labels, "quantile": q})
+                    lines.append(f"{quantile}{labels} {histogram.quantile(q)!r}")
+
+        if broadcaster is not None:
+            lines.append("# TYPE nexus_clients gauge")
+            lines.append(f"nexus_clients {len(broadcaster)}")
+            clients = broadcaster.snapshot()
+            for metric, field, doc in (
+                ("nexus_client_frames_sent_total", "sent", "Frames enviados al cliente"),
+                ("nexus_client_frames_dropped_total", "dropped", "Frames que el cliente no llegó a recibir"),
+                ("nexus_client_frames_coalesced_total", "coalesced", "Frames sustituidos por uno más nuevo en cola"),
+                ("nexus_client_frames_downsampled_total", "downsampled", "Frames saltados por el ritmo adaptativo"),
+                ("nexus_client_bytes_out_total", "bytes_out", "Bytes enviados al cliente"),
+            ):
+                lines.append(f"# HELP {metric} {doc}")
+                lines.append(f"# TYPE {metric} counter")
+                for client, stats in clients.items():
+                    labels = _labels({"client": client, "format": stats["format"]})
+                    lines.append(f"{metric}{labels} {stats[field]}")
+
+        if gate is not None:
+            lines.append("# TYPE nexus_frames_suppressed_total counter")
+            lines.append(f"nexus_frames_suppressed_total {gate.suppressed}")
+
+        if udp is not None:
+            for metric, value, doc in (
+                ("nexus_udp_datagrams_sent_total", udp.sent, "Datagramas UDP enviados"),
+                ("nexus_udp_send_errors_total", udp.errors, "Datagramas UDP que el kernel no aceptó"),
+                ("nexus_udp_bytes_out_total", udp.bytes_out, "Bytes enviados por UDP"),
+            ):
+                lines.append(f"# HELP {metric} {doc}")
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
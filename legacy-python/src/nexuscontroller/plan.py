@@ -0,0 +1,125 @@
+from .processing import compile_processing
+
+# Orden fijo de los campos de un frame (el mismo que produce read() / to_json)
+FIELDS = (
+    "a", "b", "x", "y", "lb", "rb", "back", "start", "l3", "r3",
+    "up", "down", "left", "right",
+    "lx", "ly", "rx", "ry", "lt", "rt"
+)
+SLOT = {name: i for i, name in enumerate(FIELDS)}
+
+# Campo de salida -> nombre semántico en el perfil JSON
+BUTTON_FIELDS = {
+    "a": "face_bottom", "b": "face_right", "x": "face_left", "y": "face_top",
+    "lb": "shoulder_left", "rb": "shoulder_right",
+    "back": "select", "start": "start",
+    "l3": "thumbl", "r3": "thumbr",
+}
+AXIS_FIELDS = {
+    "lx": "left_stick_x", "ly": "left_stick_y",
+    "rx": "right_stick_x", "ry": "right_stick_y",
+    "lt": "trigger_left", "rt": "trigger_right",
+}
+
+KIND_BUTTON = 0
+KIND_AXIS = 1
+
+# Recorrido mínimo (desde el centro) para fiarse de la calibración de un lado del eje
+MIN_TRAVEL = 0.2
+
+_UP, _DOWN, _LEFT, _RIGHT = SLOT["up"], SLOT["down"], SLOT["left"], SLOT["right"]
+
+
+class Frame:
+    """Preallocated frame: one slot per entry of ``FIELDS``, reused every tick."""
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = [0] * len(FIELDS)
+        for name in AXIS_FIELDS:
+            self.values[SLOT[name]] = 0.0
+
+    def __getitem__(self, name):
+        return self.values[SLOT[name]]
+
+    def as_dict(self):
+        return dict(zip(FIELDS, self.values))
+
+
+class ReadPlan:
+    """A profile compiled into flat (slot, device index, baseline, kind, scale) entries.
+
+    Built once per profile; ``run()`` then fills a frame with no string lookups.
+    Buttons and axes are kept in separate tuples so the loops don't branch on kind.
+    ``scale`` is the (negative, positive) gain that maps the calibrated travel
+    of an axis to -1..1; (1.0, 1.0) when the profile has no travel data.
+    ``stages`` (deadzones and response curves) run last, over the whole frame.
+    """
+
+    __slots__ = ("entries", "buttons", "axes", "hat", "stages")
+
+    def __init__(self, entries, hat=None, stages=()):
+        self.entries = tuple(entries)
+        self.buttons = tuple((slot, index) for slot, index, _, kind, _ in self.entries if kind == KIND_BUTTON)
+        self.axes = tuple(
+            (slot, index, base) + scale
+            for slot, index, base, kind, scale in self.entries if kind == KIND_AXIS
+        )
+        self.hat = hat
+        self.stages = stages
+
+    def run(self, joystick, values):
+        get_button = joystick.get_button
+        for slot, index in self.buttons:
+            values[slot] = 1 if get_button(index) else 0
+
+        get_axis = joystick.get_axis
+        for slot, index, base, neg, pos in self.axes:
+            v = get_axis(index) - base
+            v = v * pos if v > 0 else v * neg
+            values[slot] = -1.0 if v < -1.0 else (1.0 if v > 1.0 else v)
+
+        if self.hat is not None:
+            dx, dy = joystick.get_hat(self.hat)
+            values[_UP] = 1 if dy == 1 else 0
+            values[_DOWN] = 1 if dy == -1 else 0
+            values[_LEFT] = 1 if dx == -1 else 0
+            values[_RIGHT] = 1 if dx == 1 else 0
+
+        for stage in self.stages:
+            stage(values)
+        return values
+
+
+def _axis_scale(mapping, index, base):
+    """(negative, positive) gain from the calibrated travel, see calibration.to_profile."""
+    calibration = mapping.get("calibration", {})
+    if not calibration.get("travel"):
+        return 1.0, 1.0
+
+    low = calibration.get("min", {}).get(str(index))
+    high = calibration.get("max", {}).get(str(index))
+    neg = 1.0 / (base - low) if low is not None and base - low >= MIN_TRAVEL else 1.0
+    pos = 1.0 / (high - base) if high is not None and high - base >= MIN_TRAVEL else 1.0
+    return neg, pos
+
+
+def compile_profile(mapping):
+    """Compile a profile dict (buttons/axes/hats/baseline/processing) into a ``ReadPlan``."""
+    buttons = mapping.get("buttons", {})
+    axes = mapping.get("axes", {})
+    baseline = {int(k): v for k, v in mapping.get("baseline", {}).items()}
+
+    entries = []
+    for name, semantic in BUTTON_FIELDS.items():
+        index = buttons.get(semantic)
+        if index is not None and index >= 0:
+            entries.append((SLOT[name], index, 0.0, KIND_BUTTON, None))
+    for name, semantic in AXIS_FIELDS.items():
+        index = axes.get(semantic)
+        if index is not None and index >= 0:
+            base = baseline.get(index, 0.0)
+            entries.append((SLOT[name], index, base, KIND_AXIS, _axis_scale(mapping, index, base)))
+
+    return ReadPlan(entries, mapping.get("hats", {}).get("dpad"), compile_processing(mapping, SLOT))
@@ -0,0 +1,135 @@
+import math
+
+# Resolución de las tablas de respuesta (entrada 0..1 cuantizada a LUT_SIZE pasos)
+LUT_SIZE = 4096
+_LUT_MAX = LUT_SIZE - 1
+
+# Sin deadzone explícita, se usa el ruido calibrado del eje multiplicado por esto
+NOISE_DEADZONE_FACTOR = 1.5
+
+STICKS = {"left_stick": ("lx", "ly"), "right_stick": ("rx", "ry")}
+TRIGGERS = {"trigger_left": "lt", "trigger_right": "rt"}
+
+
+def _custom_curve(points):
+    points = sorted((float(x), float(y)) for x, y in points)
+    if points[0][0] > 0.0:
+        points.insert(0, (0.0, 0.0))
+    if points[-1][0] < 1.0:
+        points.append((1.0, 1.0))
+
+    def curve(t):
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if t <= x1:
+                return y0 if x1 == x0 else y0 + (y1 - y0) * (t - x0) / (x1 - x0)
+        return points[-1][1]
+    return curve
+
+
+def response_curve(cfg):
+    """Curve t -> out over 0..1 described by ``cfg["curve"]``."""
+    kind = cfg.get("curve", "linear")
+    if kind == "linear":
+        return lambda t: t
+    if kind == "exponential":
+        exponent = float(cfg.get("exponent", 2.0))
+        return lambda t: t ** exponent
+    if kind == "custom":
+        return _custom_curve(cfg["points"])
+    raise ValueError(f"Curva de respuesta desconocida: {kind}")
+
+
+def build_lut(cfg, deadzone=0.0):
+    """Response for magnitudes 0..1: inner deadzone, outer deadzone, then the curve."""
+    inner = float(cfg.get("deadzone", deadzone))
+    outer = float(cfg.get("outer", 1.0))
+    if not 0.0 <= inner < outer <= 1.0:
+        raise ValueError(f"Deadzone inválida: interior {inner}, exterior {outer}")
+
+    curve = response_curve(cfg)
+    lut = []
+    for i in range(LUT_SIZE):
+        m = i / _LUT_MAX
+        t = (m - inner) / (outer - inner)
+        lut.append(0.0 if t <= 0.0 else min(1.0, max(0.0, curve(min(1.0, t)))))
+    return lut
+
+
+class AxialStage:
+    """Deadzone + curve applied to each axis on its own."""
+
+    __slots__ = ("slots", "lut")
+
+    def __init__(self, slots, lut):
+        self.slots = slots
+        self.lut = lut
+
+    def __call__(self, values):
+        lut = self.lut
+        for slot in self.slots:
+            v = values[slot]
+            out = lut[int(min(1.0, abs(v)) * _LUT_MAX)]
+            values[slot] = -out if v < 0.0 and out else out
+
+
+class RadialStage:
+    """Deadzone + curve on the stick's magnitude, keeping its direction."""
+
+    __slots__ = ("x", "y", "lut")
+
+    def __init__(self, x, y, lut):
+        self.x = x
+        self.y = y
+        self.lut = lut
+
+    def __call__(self, values):
+        x = values[self.x]
+        y = values[self.y]
+        m = math.sqrt(x * x + y * y)
+        if m == 0.0:
+            return
+        scale = self.lut[int(min(1.0, m) * _LUT_MAX)] / m
+        values[self.x] = x * scale
+        values[self.y] = y * scale
+
+
+def _calibrated_deadzone(mapping, semantic_names):
+    """Deadzone from the calibrated noise of the axes behind ``semantic_names``."""
+    noise = mapping.get("calibration", {}).get("noise", {})
+    axes = mapping.get("axes", {})
+    levels = [noise.get(str(axes.get(name)), 0.0) for name in semantic_names]
+    return min(0.5, max(levels, default=0.0) * NOISE_DEADZONE_FACTOR)
+
+
+def compile_processing(mapping, slot):
+    """Stages for the ``processing`` section of a profile, applied after the raw read.
+
+    ``slot`` maps output field names to frame slots (``plan.SLOT``).
+
+    ``{"left_stick": {"deadzone": 0.1, "type": "radial", "outer": 0.95,
+    "curve": "exponential", "exponent": 2}, "trigger_left": {...}}``.
+    Curves: ``linear``, ``exponential`` (``exponent``) or ``custom``
+    (``points``: [[in, out], ...], linearly interpolated). Everything is
+    baked into lookup tables here, so the per-sample cost is constant.
+    """
+    config = mapping.get("processing", {})
+    axes = mapping.get("axes", {})
+    stages = []
+
+    for name, (fx, fy) in STICKS.items():
+        cfg = config.get(name)
+        if cfg is None or f"{name}_x" not in axes:
+            continue
+        lut = build_lut(cfg, _calibrated_deadzone(mapping, (f"{name}_x", f"{name}_y")))
+        if cfg.get("type", "radial") == "radial":
+            stages.append(RadialStage(slot[fx], slot[fy], lut))
+        else:
+            stages.append(AxialStage((slot[fx], slot[fy]), lut))
+
+    for name, field in TRIGGERS.items():
+        cfg = config.get(name)
+        if cfg is None or name not in axes:
+            continue
+        stages.append(AxialStage((slot[field],), build_lut(cfg, _calibrated_deadzone(mapping, (name,)))))
+
+    return tuple(stages)
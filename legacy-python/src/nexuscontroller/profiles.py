@@ -0,0 +1,275 @@
+import contextlib
+import glob
+import json
+import os
+import pickle
+
+from . import gamecontrollerdb, plan, processing
+from .plan import compile_profile
+
+DEFAULT_PROFILE = "default_config.json"
+
+# Caché en disco de los perfiles ya compilados: una entrada por fichero, válida mientras
+# no cambien su mtime y tamaño (ni el código que compila, ver _compiler_stamp)
+PROFILE_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "nexuscontroller")
+PROFILE_CACHE_FILE = "profiles.pickle"
+
+# Cada cuántos segundos se mira si los perfiles han cambiado en disco (0 = no se vigilan)
+PROFILE_POLL_INTERVAL = 2.0
+
+
+def load_profile(filename):
+    """Load a mapping profile from JSON. Returns {} if it can't be read."""
+    if not os.path.exists(filename):
+        print(f"⚠️ ERROR: No existe {filename}")
+        return {}
+
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            print(f"✅ Perfil cargado: {data.get('name', 'Unknown')}")
+            return data
+    except Exception as e:
+        print(f"❌ Error JSON: {e}")
+        return {}
+
+
+@contextlib.contextmanager
+def default_profile_path():
+    """Filesystem path of the package's default_config.json."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_PROFILE)
+    if os.path.exists(path):
+        yield path
+        return
+    # Paquete dentro de un zip/wheel sin extraer: importlib.resources lo saca a un temporal
+    from importlib import resources
+    with resources.as_file(resources.files(__package__).joinpath(DEFAULT_PROFILE)) as p:
+        yield str(p)
+
+
+def load_default_profile():
+    """Load the package's default_config.json."""
+    try:
+        with default_profile_path() as p:
+            print(f"📂 Usando configuración por defecto del paquete: {p}")
+            return load_profile(p)
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar default_config.json desde el paquete: {e}")
+        return {}
+
+
+def _compiler_stamp():
+    """Changes whenever the code that builds a ``ReadPlan`` does (e.g. a package upgrade)."""
+    stamp = []
+    for module in (plan, processing):
+        st = os.stat(module.__file__)
+        stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+class CompiledProfile:
+    """A profile dict plus its ``ReadPlan``, ready to hand to a ``Pad``."""
+
+    __slots__ = ("profile", "plan", "source")
+
+    def __init__(self, profile, plan=None, source=None):
+        self.profile = profile
+        self.plan = plan if plan is not None else compile_profile(profile)
+        self.source = source
+
+    @property
+    def name(self):
+        return self.profile.get("name")
+
+
+class ProfileStore:
+    """Every profile the server knows, indexed by GUID and by pad name.
+
+    ``config_path`` is a profile JSON or a directory of them (plus the
+    package default); None is the package default alone. The index is
+    built once, so a pad plugged in later costs a dict lookup: by GUID,
+    then in the ``gamecontrollerdb`` files (SDL mapping format), then by
+    the name SDL reports, then the default profile. Compiled profiles are
+    cached in ``cache_dir`` (None = no cache) so a restart only parses and
+    compiles the files that changed; SDL mappings are only converted and
+    compiled for pads that actually connect.
+    """
+
+    def __init__(self, config_path=None, cache_dir=PROFILE_CACHE_DIR, gamecontrollerdb=()):
+        self.config_path = config_path
+        self.cache_dir = cache_dir
+        self.gamecontrollerdb = tuple(gamecontrollerdb or ())
+        self.sdl_mappings = {}
+        self.cache_path = os.path.join(cache_dir, PROFILE_CACHE_FILE) if cache_dir else None
+        self.by_guid = {}
+        self.by_name = {}
+        self.default = None
+        self.compiled = 0
+        self.cached = 0
+
+        self._stamp = _compiler_stamp()
+        self._cache = self._read_cache()
+        self._dirty = False
+        # Antes de leer nada: si algo cambia durante la carga, la siguiente comprobación lo ve
+        self.built_from = self.fingerprint()
+        self.build()
+        self._write_cache()
+
+    def __len__(self):
+        return len({id(p) for p in self.by_guid.values()} | {id(p) for p in self.by_name.values()})
+
+    def build(self):
+        config_path = self.config_path
+        if config_path and os.path.isdir(config_path):
+            print(f"📂 Directorio de perfiles: {os.path.abspath(config_path)}")
+            for filename in sorted(glob.glob(os.path.join(config_path, "*.json"))):
+                try:
+                    self.add(self._compile(filename))
+                except ValueError as e:
+                    print(f"❌ Perfil inválido {filename}: {e}")
+            self.default = self._compile_default()
+        elif config_path:
+            print(f"📂 Configuración: {os.path.abspath(config_path)}")
+            self.default = self._compile(config_path)
+        else:
+            self.default = self._compile_default()
+        # El perfil por defecto también se indexa, pero sin pisar a los del directorio
+        self.add(self.default, replace=False)
+        print(f"📚 {len(self)} perfiles indexados ({self.cached} de caché, {self.compiled} compilados)")
+
+        for path in self.gamecontrollerdb:
+            try:
+                self.sdl_mappings.update(gamecontrollerdb.load([path]))
+            except OSError as e:
+                print(f"⚠️ No se pudo leer {path}: {e}")
+        if self.gamecontrollerdb:
+            print(f"🎮 {len(self.sdl_mappings)} mandos conocidos en gamecontrollerdb "
+                  f"({gamecontrollerdb.current_platform()})")
+
+    def _watched(self):
+        config_path = self.config_path
+        if config_path and os.path.isdir(config_path):
+            paths = sorted(glob.glob(os.path.join(config_path, "*.json")))
+        else:
+            paths = [config_path] if config_path else []
+        return paths + list(self.gamecontrollerdb)
+
+    def fingerprint(self):
+        """``(path, mtime, size)`` of every file a rebuild would read (a few ``stat()`` calls)."""
+        stamps = []
+        for path in self._watched():
+            try:
+                st = os.stat(path)
+            except OSError:
+                stamps.append((path, None, None))
+            else:
+                stamps.append((path, st.st_mtime_ns, st.st_size))
+        return tuple(stamps)
+
+    def changed(self):
+        return self.fingerprint() != self.built_from
+
+    def reload(self):
+        """A new store from the same configuration; this one is left untouched.
+
+        Meant to run off the hot path (e.g. in an executor): unchanged files
+        come from the cache. Raises ValueError instead of returning a store
+        that lost the configured profile (unreadable JSON, bad processing).
+        """
+        store = ProfileStore(self.config_path, self.cache_dir, self.gamecontrollerdb)
+        if self.config_path and not os.path.isdir(self.config_path) and not store.default.profile:
+            raise ValueError(f"No se pudo leer {self.config_path}")
+        return store
+
+    def add(self, compiled, replace=True):
+        profile = compiled.profile
+        for index, key in ((self.by_guid, profile.get("guid")), (self.by_name, profile.get("name"))):
+            if key and (replace or key not in index):
+                index[key] = compiled
+
+    def lookup(self, guid=None, name=None):
+        """The ``CompiledProfile`` for a pad: by GUID, in gamecontrollerdb, by name, else the default."""
+        profile = self.by_guid.get(guid)
+        if profile is None and guid and self.sdl_mappings:
+            profile = self._from_gamecontrollerdb(guid)
+        return profile or self.by_name.get(name) or self.default
+
+    def _from_gamecontrollerdb(self, guid):
+        entry = self.sdl_mappings.get(gamecontrollerdb.normalize_guid(guid))
+        if entry is None:
+            return None
+        name, fields = entry
+        compiled = CompiledProfile(gamecontrollerdb.to_profile(name, fields, guid), source="gamecontrollerdb")
+        print(f"🎮 Perfil de gamecontrollerdb para {guid}: {name}")
+        # Queda indexado: si se vuelve a conectar es una búsqueda directa
+        self.by_guid[guid] = compiled
+        return compiled
+
+    def for_joystick(self, joystick, backend=None):
+        """Profile for an opened joystick; one imposed by ``backend`` (e.g. a replay) wins."""
+        imposed = backend.profile_for(joystick) if backend else None
+        if imposed:
+            return CompiledProfile(imposed)
+        try:
+            guid = joystick.get_guid()
+        except Exception:
+            guid = None
+        return self.lookup(guid, joystick.get_name())
+
+    def _compile(self, filename):
+        path = os.path.abspath(filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            # load_profile avisa de que no existe
+            return CompiledProfile(load_profile(path), source=path)
+
+        key = (st.st_mtime_ns, st.st_size)
+        entry = self._cache.get(path)
+        if entry and entry[0] == key:
+            self.cached += 1
+            return CompiledProfile(entry[1], entry[2], path)
+
+        compiled = CompiledProfile(load_profile(path), source=path)
+        self.compiled += 1
+        self._cache[path] = (key, compiled.profile, compiled.plan)
+        self._dirty = True
+        return compiled
+
+    def _compile_default(self):
+        try:
+            with default_profile_path() as p:
+                return self._compile(p)
+        except OSError as e:
+            print(f"⚠️ No se pudo cargar default_config.json desde el paquete: {e}")
+            return CompiledProfile({})
+
+    def _read_cache(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "rb") as f:
+                stamp, entries = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Caché de perfiles ilegible, se reconstruye: {e}")
+            return {}
+        return entries if stamp == self._stamp else {}
+
+    def _write_cache(self):
+        if not self.cache_path or not self._dirty:
+            return
+        # Fuera las entradas de ficheros que ya no existen
+        entries = {path: entry for path, entry in self._cache.items() if os.path.exists(path)}
+        tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump((self._stamp, entries), f, pickle.HIGHEST_PROTOCOL)
+            # Otro servidor puede estar escribiéndola a la vez: gana el último, nunca queda a medias
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la caché de perfiles: {e}")
+        self._dirty = False
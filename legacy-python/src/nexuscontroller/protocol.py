@@ -0,0 +1,255 @@
+import json
+import struct
+from urllib.parse import parse_qs, urlsplit
+
+from .core import InputSource, rounded
+from .devices import DeviceManager
+from .plan import AXIS_FIELDS, BUTTON_FIELDS, FIELDS
+
+# Formatos de cable que un cliente puede negociar
+FORMAT_JSON = "json"
+FORMAT_DELTA = "delta"
+FORMAT_BINARY = "binary"
+FORMATS = (FORMAT_JSON, FORMAT_DELTA, FORMAT_BINARY)
+
+DELTA_SUBPROTOCOL = "nexus.delta.v1"
+BINARY_SUBPROTOCOL = "nexus.bin.v1"
+SUBPROTOCOLS = {DELTA_SUBPROTOCOL: FORMAT_DELTA, BINARY_SUBPROTOCOL: FORMAT_BINARY}
+
+# Binario v1: por mando, cabecera <BHB (versión, seq u16, índice de mando) + los 14 bytes de to_bytes
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<BHB')
+
+# Cada cuántos segundos se manda un frame completo a los clientes delta
+KEYFRAME_INTERVAL = 2.0
+
+# Atajos que un cliente puede pedir en "fields" en lugar de enumerar campos
+FIELD_GROUPS = {
+    "buttons": tuple(BUTTON_FIELDS),
+    "dpad": ("up", "down", "left", "right"),
+    "sticks": ("lx", "ly", "rx", "ry"),
+    "triggers": ("lt", "rt"),
+    "axes": tuple(AXIS_FIELDS),
+}
+
+
+def select_subprotocol(connection, subprotocols):
+    """Accept one of our subprotocols if offered; plain clients stay on JSON."""
+    for subprotocol in subprotocols:
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol
+    return None
+
+
+def client_format(websocket):
+    """Wire format requested by a client: subprotocol first, then ``?protocol=``."""
+    fmt = SUBPROTOCOLS.get(websocket.subprotocol)
+    if fmt:
+        return fmt
+
+    try:
+        query = parse_qs(urlsplit(websocket.request.path).query)
+    except Exception:
+        return FORMAT_JSON
+    fmt = query.get("protocol", [FORMAT_JSON])[0]
+    return fmt if fmt in FORMATS else FORMAT_JSON
+
+
+class Subscription:
+    """What a client asked for: some pads, some fields, at most ``rate`` Hz.
+
+    None means "all" (or "every tick" for ``rate``). Hashable, so clients
+    with identical subscriptions share one group and one encoded payload.
+    """
+
+    __slots__ = ("pads", "fields", "rate")
+
+    def __init__(self, pads=None, fields=None, rate=None):
+        self.pads = frozenset(pads) if pads is not None else None
+        # En el orden de FIELDS, para que el payload no dependa del orden pedido
+        self.fields = tuple(f for f in FIELDS if f in fields) if fields is not None else None
+        self.rate = rate
+
+    @property
+    def key(self):
+        return self.pads, self.fields, self.rate
+
+    def __eq__(self, other):
+        return isinstance(other, Subscription) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def as_dict(self):
+        return {
+            "pads": sorted(self.pads) if self.pads is not None else None,
+            "fields": list(self.fields) if self.fields is not None else None,
+            "rate": self.rate,
+        }
+
+    def filter(self, data, multi, keep_fields=False):
+        """The part of a frame this subscription wants (None if nothing).
+
+        ``keep_fields`` skips the field filter, for fixed layouts (binary).
+        """
+        fields = None if keep_fields else self.fields
+        if not multi:
+            if self.pads is not None and 0 not in self.pads:
+                return None
+            return data if fields is None else {k: data[k] for k in fields}
+
+        frames = [d for d in data if self.pads is None or d["player"] in self.pads]
+        if fields is not None:
+            frames = [dict({k: d[k] for k in fields}, player=d["player"]) for d in frames]
+        return frames or None
+
+
+FULL = Subscription()
+
+
+def parse_subscription(msg):
+    """``{"t": "subscribe", "pads": [0], "fields": ["sticks", "a"], "rate": 10}`` -> Subscription.
+
+    Missing keys mean "all". Raises ValueError with a message for the client.
+    """
+    pads = msg.get("pads")
+    if pads is not None:
+        if not isinstance(pads, list) or not all(isinstance(p, int) and p >= 0 for p in pads):
+            raise ValueError("pads debe ser una lista de índices de mando")
+
+    fields = msg.get("fields")
+    if fields is not None:
+        if not isinstance(fields, list):
+            raise ValueError("fields debe ser una lista")
+        expanded = set()
+        for name in fields:
+            if name in FIELD_GROUPS:
+                expanded.update(FIELD_GROUPS[name])
+            elif name in FIELDS:
+                expanded.add(name)
+            else:
+                raise ValueError(f"campo desconocido: {name}")
+        fields = expanded
+
+    rate = msg.get("rate")
+    if rate is not None and (not isinstance(rate, (int, float)) or rate <= 0):
+        raise ValueError("rate debe ser un número de Hz mayor que 0")
+
+    return Subscription(pads, fields, rate)
+
+
+def _state(data, multi):
+    if multi:
+        return {str(d["player"]): rounded(d) for d in data}
+    return rounded(data)
+
+
+class Encoder:
+    """Turns one frame into the payload for every client of a wire format."""
+
+    # Formatos de layout fijo: no se les puede quitar campos, sólo mandos
+    fixed_layout = False
+
+    def __init__(self, multi=False):
+        self.multi = multi
+
+    def encode(self, data, now):
+        raise NotImplementedError
+
+    def keyframe(self):
+        """Message for a client joining mid-stream, if the format needs one."""
+        return None
+
+
+class JsonEncoder(Encoder):
+    """Plain JSON: the flat dict from ``InputSource.to_json``, or ``{"pads": [...]}`` in multi mode."""
+
+    def encode(self, data, now):
+        return DeviceManager.to_json(data) if self.multi else InputSource.to_json(data)
+
+
+class DeltaEncoder(Encoder):
+    """Shared keyframe + delta encoder for every client of a delta broadcast group.
+
+    Messages carry a ``seq`` that grows by one per message sent, so a client
+    that sees a jump knows it lost something and can wait for the next keyframe.
+    Keyframe: ``{"t": "key", "seq": n, "d": {...}}``; delta: ``{"t": "delta", ...}``
+    with only the changed fields. In multi mode ``d`` is keyed by player index.
+    """
+
+    def __init__(self, multi=False, keyframe_interval=KEYFRAME_INTERVAL):
+        super().__init__(multi)
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.last = None
+        self.last_keyframe = 0.0
+
+    def _message(self, kind, payload):
+        return json.dumps({"t": kind, "seq": self.seq, "d": payload})
+
+    def keyframe(self):
+        """Current state as a keyframe, for a client that just connected."""
+        if self.last is None:
+            return None
+        return self._message("key", self.last)
+
+    def _diff(self, state):
+        if not self.multi:
+            return {k: v for k, v in state.items() if self.last.get(k) != v}
+
+        changes = {}
+        for player, pad in state.items():
+            old = self.last[player]
+            fields = {k: v for k, v in pad.items() if old.get(k) != v}
+            if fields:
+                changes[player] = fields
+        return changes
+
+    def encode(self, data, now):
+        """Message for this frame, or None if nothing changed."""
+        state = _state(data, self.multi)
+
+        needs_key = (
+            self.last is None
+            or now - self.last_keyframe >= self.keyframe_interval
+            # Si entra o sale un mando el delta no tiene sentido
+            or (self.multi and state.keys() != self.last.keys())
+        )
+        if needs_key:
+            self.seq += 1
+            self.last = state
+            self.last_keyframe = now
+            return self._message("key", state)
+
+        changes = self._diff(state)
+        if not changes:
+            return None
+
+        self.seq += 1
+        self.last = state
+        return self._message("delta", changes)
+
+
+class BinaryEncoder(Encoder):
+    """Packs a frame for ``nexus.bin.v1`` clients: 18 bytes per pad.
+
+    Each record is the ``<BHB`` header (version, seq, pad index) followed by the
+    ``InputSource.to_bytes`` payload. In multi mode all pads of a tick go in one
+    message, sharing the same seq (which wraps at 65535).
+    """
+
+    fixed_layout = True
+
+    def __init__(self, multi=False):
+        super().__init__(multi)
+        self.seq = 0
+
+    def encode(self, data, now):
+        self.seq = (self.seq + 1) & 0xFFFF
+        if not self.multi:
+            return BINARY_HEADER.pack(BINARY_VERSION, self.seq, 0) + InputSource.to_bytes(data)
+
+        return b''.join(
+            BINARY_HEADER.pack(BINARY_VERSION, self.seq, d["player"]) + InputSource.to_bytes(d)
+            for d in data
+        )
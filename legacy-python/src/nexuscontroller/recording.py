@@ -0,0 +1,397 @@
+import json
+import mmap
+import os
+import struct
+import time
+
+from .core import DEVICE_ADDED, DEVICE_REMOVED, PAYLOAD_SIZE, Backend, InputSource
+from .plan import AXIS_FIELDS, BUTTON_FIELDS
+
+# Fichero: cabecera MAGIC y después registros de 23 bytes, uno por mando y frame:
+# <dB (segundos desde el inicio, índice de mando) + los 14 bytes de to_bytes
+MAGIC = b"NXREC\x01"
+RECORD_HEADER = struct.Struct('<dB')
+RECORD_SIZE = RECORD_HEADER.size + PAYLOAD_SIZE
+_TIMESTAMP = struct.Struct('<d')
+
+# Layout de un registro como dtype estructurado de NumPy (sin padding: 23 bytes)
+RECORD_DTYPE = [
+    ("t", "<f8"), ("pad", "u1"), ("buttons", "<u2"),
+    ("lx", "<i2"), ("ly", "<i2"), ("rx", "<i2"), ("ry", "<i2"), ("lt", "<i2"), ("rt", "<i2"),
+]
+
+# Cada cuántos registros se guarda un timestamp en el índice disperso
+INDEX_EVERY = 1024
+
+
+def _last_timestamp(path, size):
+    records = (size - len(MAGIC)) // RECORD_SIZE
+    if records <= 0:
+        return 0.0
+    with open(path, "rb") as f:
+        f.seek(len(MAGIC) + (records - 1) * RECORD_SIZE)
+        return RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))[0]
+
+
+def _valid_size(path):
+    """Size of the whole records of an existing recording, dropping a torn last one.
+
+    A killed server leaves the last buffered write cut anywhere; appending
+    after it would misalign every later record. Raises ValueError if the
+    file isn't a recording.
+    """
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC))
+        size = os.fstat(f.fileno()).st_size
+    if head != MAGIC[:len(head)] or (size >= len(MAGIC) and head != MAGIC):
+        raise ValueError(f"{path} no es una grabación de NexusController")
+    if size < len(MAGIC):
+        # Cortada dentro de la cabecera: no hay ningún registro que conservar
+        return 0
+    return len(MAGIC) + (size - len(MAGIC)) // RECORD_SIZE * RECORD_SIZE
+
+
+class Recorder:
+    """Appends timestamped frames from ``read()`` to a compact binary log."""
+
+    def __init__(self, path):
+        self.path = path
+        size = 0
+        if os.path.exists(path):
+            size = _valid_size(path)
+            if size != os.path.getsize(path):
+                print(f"✂️ {path}: descartado el último registro incompleto")
+                os.truncate(path, size)
+        # Al añadir a una grabación existente el tiempo continúa donde se quedó
+        offset = _last_timestamp(path, size) if size else 0.0
+        self._file = open(path, "ab")
+        if not size:
+            self._file.write(MAGIC)
+        self._start = time.monotonic() - offset
+        self.frames = 0
+
+    def write(self, data, timestamp=None):
+        """Append one frame (a dict, or a list of dicts tagged with ``player``)."""
+        if not data:
+            return
+        if timestamp is None:
+            timestamp = time.monotonic()
+        t = timestamp - self._start
+
+        if isinstance(data, dict):
+            self._file.write(RECORD_HEADER.pack(t, 0) + InputSource.to_bytes(data))
+        else:
+            self._file.write(b''.join(
+                RECORD_HEADER.pack(t, d["player"]) + InputSource.to_bytes(d) for d in data
+            ))
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+
+class Recording:
+    """Random access to a recording through ``mmap``, without parsing it.
+
+    Records have a fixed size and increasing timestamps, so the file itself
+    is the table. On open a sparse time index (every ``INDEX_EVERY``-th
+    timestamp) is built, which only touches one page per block; seeking is
+    a bisect over that index plus a bisect inside one block: O(log n).
+    ``records()`` / ``between()`` return NumPy structured arrays that are
+    views over the map (zero copy); they need ``numpy`` installed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC):
+                raise ValueError(f"{path} no es una grabación de NexusController")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} no es una grabación de NexusController")
+
+        # Un registro a medio escribir al final (grabación cortada) se ignora
+        self.count = (size - len(MAGIC)) // RECORD_SIZE
+        self.index = [self.timestamp(i) for i in range(0, self.count, INDEX_EVERY)]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def duration(self):
+        return self.timestamp(self.count - 1) if self.count else 0.0
+
+    def timestamp(self, i):
+        return _TIMESTAMP.unpack_from(self._mm, len(MAGIC) + i * RECORD_SIZE)[0]
+
+    def record(self, i):
+        """``(timestamp, pad, payload)`` of record ``i``."""
+        offset = len(MAGIC) + i * RECORD_SIZE
+        t, pad = RECORD_HEADER.unpack_from(self._mm, offset)
+        return t, pad, self._mm[offset + RECORD_HEADER.size:offset + RECORD_SIZE]
+
+    def _bisect(self, t, lo, right):
+        # Primero el bloque por el índice disperso, luego dentro del bloque
+        index = self.index
+        b_lo, b_hi = lo // INDEX_EVERY, len(index)
+        while b_lo < b_hi:
+            mid = (b_lo + b_hi) // 2
+            if index[mid] < t or (right and index[mid] == t):
+                b_lo = mid + 1
+            else:
+                b_hi = mid
+        hi = min(self.count, b_lo * INDEX_EVERY)
+        lo = max(lo, (b_lo - 1) * INDEX_EVERY)
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            ts = self.timestamp(mid)
+            if ts < t or (right and ts == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def seek(self, t, lo=0):
+        """Index of the first record at or after ``t`` seconds."""
+        return self._bisect(t, lo, right=False)
+
+    def seek_after(self, t, lo=0):
+        """Index of the first record strictly after ``t`` seconds."""
+        return self._bisect(t, lo, right=True)
+
+    def frame_start(self, i):
+        """First record of the frame that record ``i`` belongs to."""
+        t = self.timestamp(i)
+        while i > 0 and self.timestamp(i - 1) == t:
+            i -= 1
+        return i
+
+    def frame(self, i):
+        """``([(pad, payload), ...], next_index)`` for the frame starting at ``i``."""
+        t = self.timestamp(i)
+        pads = []
+        while i < self.count and self.timestamp(i) == t:
+            _, pad, payload = self.record(i)
+            pads.append((pad, payload))
+            i += 1
+        return pads, i
+
+    def records(self, start=0, stop=None):
+        """Records ``[start, stop)`` as a zero-copy NumPy structured array."""
+        import numpy as np
+
+        stop = self.count if stop is None else min(stop, self.count)
+        return np.frombuffer(self._mm, dtype=np.dtype(RECORD_DTYPE), count=max(0, stop - start),
+                             offset=len(MAGIC) + start * RECORD_SIZE)
+
+    def between(self, t0, t1):
+        """Records with ``t0 <= t < t1`` as a zero-copy NumPy structured array."""
+        start = self.seek(t0)
+        return self.records(start, self.seek(t1, start))
+
+    def close(self):
+        # Falla con BufferError si aún vive algún array de records(): hay que soltarlos antes
+        self._mm.close()
+
+
+class Playback:
+    """Walks a ``Recording`` in time, shared by ``ReplaySource`` and ``ReplayBackend``.
+
+    ``speed`` scales the original timing (2.0 = twice as fast); ``speed=0``
+    yields the next recorded frame on every ``current()``, as fast as the
+    caller polls. ``start`` jumps to that many seconds into the recording.
+    """
+
+    def __init__(self, recording, speed=1.0, loop=False, start=0.0):
+        self.recording = recording
+        self.speed = speed
+        self.loop = loop
+        self.finished = False
+        self._first = recording.seek(start)
+        self._pos = self._first
+        self._current = None
+        self._start = None
+
+    def _restart(self):
+        self._pos = self._first
+        self._current = None
+        self._start = None
+
+    def current(self):
+        """``[(pad, payload), ...]`` of the frame due now, or None (not started / finished)."""
+        rec = self.recording
+        if self._pos >= rec.count:
+            if not self.loop or self._first >= rec.count:
+                self.finished = True
+                return None
+            self._restart()
+
+        if self.speed <= 0:
+            pads, self._pos = rec.frame(self._pos)
+            return pads
+
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now - rec.timestamp(self._pos) / self.speed
+        elapsed = (now - self._start) * self.speed
+
+        # El estado es un nivel: se devuelve el último frame cuyo timestamp ya ha pasado
+        nxt = rec.seek_after(elapsed, self._pos)
+        if nxt > self._pos:
+            self._current = rec.frame_start(nxt - 1)
+            self._pos = nxt
+        if self._current is None:
+            return None
+        return rec.frame(self._current)[0]
+
+
+class ReplaySource:
+    """Plays a recording back through the same interface as ``InputSource``.
+
+    Frames come out exactly as recorded; timing options as in ``Playback``.
+    In multi mode ``read()`` returns a list like ``DeviceManager``.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, multi=False, start=0.0):
+        self.path = path
+        self.multi = multi
+        self.recording = Recording(path)
+        self.playback = Playback(self.recording, speed, loop, start)
+        self.metadata_version = 0
+        self.device_info = {
+            "connected": True,
+            "name": f"Replay: {os.path.basename(path)}",
+            "guid": None,
+            "index": -1
+        }
+        print(f"⏯️ Grabación cargada: {path} ({len(self.recording)} registros, "
+              f"{self.recording.duration:.1f} s)")
+
+    def get_metadata_json(self) -> str:
+        return json.dumps(self.device_info, indent=2)
+
+    def _frame(self, pads):
+        if not self.multi:
+            for pad, payload in pads:
+                if pad == 0:
+                    return InputSource.from_bytes(payload)
+            return None
+
+        frames = []
+        for pad, payload in pads:
+            d = InputSource.from_bytes(payload)
+            d["player"] = pad
+            frames.append(d)
+        return frames
+
+    def read(self):
+        pads = self.playback.current()
+        if pads is None:
+            if self.playback.finished and self.device_info["connected"]:
+                self.device_info = dict(self.device_info, connected=False)
+                self.metadata_version += 1
+            return None
+        return self._frame(pads)
+
+    def close(self):
+        self.recording.close()
+
+
+# Cómo ve un perfil a un ReplayJoystick: índices en el orden de plan.BUTTON_FIELDS / AXIS_FIELDS
+REPLAY_PROFILE = {
+    "name": "Replay",
+    "buttons": {semantic: i for i, semantic in enumerate(BUTTON_FIELDS.values())},
+    "axes": {semantic: i for i, semantic in enumerate(AXIS_FIELDS.values())},
+    "hats": {"dpad": 0},
+}
+_REPLAY_BUTTONS = tuple(BUTTON_FIELDS)
+_REPLAY_AXES = tuple(AXIS_FIELDS)
+
+
+class ReplayJoystick:
+    """One recorded pad seen as a raw joystick (layout in ``REPLAY_PROFILE``)."""
+
+    def __init__(self, backend, pad):
+        self.backend = backend
+        self.pad = pad
+
+    def _state(self):
+        return self.backend.state.get(self.pad, {})
+
+    def init(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def get_name(self):
+        return f"Replay: {os.path.basename(self.backend.path)} #{self.pad}"
+
+    def get_guid(self):
+        return None
+
+    def get_instance_id(self):
+        return self.pad
+
+    def get_numaxes(self):
+        return len(_REPLAY_AXES)
+
+    def get_numbuttons(self):
+        return len(_REPLAY_BUTTONS)
+
+    def get_numhats(self):
+        return 1
+
+    def get_axis(self, i):
+        return self._state().get(_REPLAY_AXES[i], 0.0)
+
+    def get_button(self, i):
+        return self._state().get(_REPLAY_BUTTONS[i], 0)
+
+    def get_hat(self, i):
+        d = self._state()
+        return d.get("right", 0) - d.get("left", 0), d.get("up", 0) - d.get("down", 0)
+
+
+class ReplayBackend(Backend):
+    """A recording as a joystick backend for ``InputSource`` / ``DeviceManager``.
+
+    Unlike ``ReplaySource`` the frames go through the whole read path
+    (``Pad``, plan, hot-plug handling): pads appearing in or vanishing from
+    the recording come out as device events. Timing options as in ``Playback``.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, start=0.0):
+        self.path = path
+        self.recording = Recording(path)
+        self.playback = Playback(self.recording, speed, loop, start)
+        self.state = {}  # pad -> frame dict decodificado en este pump
+        self.devices = []  # pads presentes, en orden de índice de dispositivo
+
+    def count(self):
+        return len(self.devices)
+
+    def open(self, index):
+        return ReplayJoystick(self, self.devices[index])
+
+    def profile_for(self, joystick):
+        # La grabación ya está mapeada: el perfil configurado no aplica
+        return REPLAY_PROFILE
+
+    def device_events(self):
+        pads = self.playback.current() or []
+        self.state = {pad: InputSource.from_bytes(payload) for pad, payload in pads}
+
+        present = sorted(self.state)
+        if present == self.devices:
+            return []
+        old, self.devices = self.devices, present
+        events = [(DEVICE_REMOVED, pad) for pad in old if pad not in self.state]
+        events += [(DEVICE_ADDED, i) for i, pad in enumerate(present) if pad not in old]
+        return events
+
+    def quit(self):
+        self.recording.close()
@@ -0,0 +1,94 @@
+import asyncio
+
+MAX_RATE = 1000
+
+
+class TickStats:
+    """Lateness and missed ticks of a loop paced on absolute deadlines.
+
+    Shared by ``TickScheduler`` and ``InputThread`` so both report jitter
+    the same way. ``lateness`` (a ``metrics.Histogram``) gets every tick's
+    lateness.
+    """
+
+    def __init__(self, rate, lateness=None):
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.lateness = lateness
+        self.ticks = 0
+        self.missed = 0
+        self._late_sum = 0.0
+        self._late_max = 0.0
+
+    def record(self, late):
+        """Count a tick that woke ``late`` seconds after its deadline; returns the ticks to skip."""
+        skipped = 0
+        if late >= self.period:
+            # Vamos uno o más ticks tarde: se saltan en vez de encadenarlos
+            skipped = int(late // self.period)
+            self.missed += skipped
+            late -= skipped * self.period
+
+        self.ticks += 1
+        if self.lateness is not None:
+            self.lateness.observe(late)
+        self._late_sum += late
+        if late > self._late_max:
+            self._late_max = late
+        return skipped
+
+    def snapshot(self, reset=False):
+        """Jitter (lateness vs. deadline) and missed ticks since the last reset."""
+        stats = {
+            "rate": self.rate,
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "jitter_avg_ms": round(self._late_sum / self.ticks * 1000, 3) if self.ticks else 0.0,
+            "jitter_max_ms": round(self._late_max * 1000, 3),
+        }
+        if reset:
+            self.ticks = 0
+            self.missed = 0
+            self._late_sum = 0.0
+            self._late_max = 0.0
+        return stats
+
+
+class TickScheduler:
+    """Paces a loop on absolute deadlines (start + n * period).
+
+    Unlike ``sleep(1 / fps)`` after the work, time spent reading and
+    broadcasting is absorbed instead of added, so the rate does not drift.
+    If the loop falls more than a whole period behind, the lost ticks are
+    counted as missed and the schedule jumps forward instead of bursting.
+    ``lateness`` (a ``metrics.Histogram``) gets every tick's lateness.
+    """
+
+    def __init__(self, rate, lateness=None):
+        if not 0 < rate <= MAX_RATE:
+            raise ValueError(f"rate must be in (0, {MAX_RATE}] Hz, got {rate}")
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.stats = TickStats(rate, lateness)
+        self._loop = asyncio.get_running_loop()
+        self._start = self._loop.time()
+        self._tick = 0
+
+    async def wait(self):
+        self._tick += 1
+        deadline = self._start + self._tick * self.period
+        delay = deadline - self._loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        now = self._loop.time()
+        self._tick += self.stats.record(now - deadline)
+        return now
+
+    def resync(self):
+        """Restart the deadline grid from now (after a deliberate pause)."""
+        self._start = self._loop.time()
+        self._tick = 0
+
+    def snapshot(self, reset=False):
+        return self.stats.snapshot(reset)
@@ -1,58 +1,478 @@
+import argparse
 import asyncio
+import json
 import logging
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
 import websockets
-from .core import InputSource
+from .broadcast import MAX_WRITE_BUFFER, Broadcaster
+from .core import InputSource, PygameBackend, listen_joy_events, skip_pygame_extras, wait_for_joy_event
+from .devices import MAX_PLAYERS, PLAYER_LIMIT, DeviceManager
+from .input_thread import IDLE_POLL, InputThread
+from .metrics import METRICS_PATH, Metrics
+from .plan import AXIS_FIELDS
+from .profiles import PROFILE_CACHE_DIR, PROFILE_POLL_INTERVAL
+from .protocol import (FORMAT_BINARY, FORMAT_DELTA, FORMAT_JSON, KEYFRAME_INTERVAL, BinaryEncoder, DeltaEncoder,
+                       JsonEncoder, client_format, parse_subscription, select_subprotocol)
+from .recording import Recorder, ReplayBackend, ReplaySource
+from .scheduler import MAX_RATE, TickScheduler
+from .shm import SHM_NAME, SharedFramePublisher
+from .startup import StartupReport
+from .suppression import AXIS_EPSILON, HEARTBEAT, ChangeGate
+from .udp import MULTICAST_TTL, UdpOutput, parse_target
+from .virtual import VirtualBackend
 
 # Configuración por defecto
 WS_PORT = 8765
 TARGET_FPS = 60
 
+# Cada cuántos segundos se informa del jitter del bucle de sondeo
+TICK_REPORT_INTERVAL = 30.0
+
+# Modo por eventos: intervalo mínimo entre frames (agrupa ráfagas) y keep-alive en reposo
+MIN_INTERVAL = 0.004
+KEEPALIVE = 1.0
+# Tope de cada espera bloqueante en SDL, para poder cancelar el bucle limpiamente
+EVENT_WAIT_SLICE = 0.5
+
+BACKENDS = ("pygame", "virtual", "replay")
+
+# Tras ver un perfil modificado se espera esto a que el editor termine de escribirlo
+PROFILE_SETTLE = 0.25
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s | %(message)s', datefmt='%H:%M:%S')
 
 
-async def _main_loop(port=WS_PORT, target_fps=TARGET_FPS, config_path=None):
+def _handle_message(message, websocket, broadcaster, scheduler=None, gate=None, metrics=None, udp=None,
+                    startup=None):
+    """Answer a control message from a client (JSON with a ``t`` field)."""
+    try:
+        msg = json.loads(message)
+        kind = msg.get("t")
+    except (ValueError, AttributeError):
+        return None
+
+    if kind == "subscribe":
+        try:
+            subscription = parse_subscription(msg)
+        except ValueError as e:
+            return json.dumps({"t": "error", "error": str(e)})
+        broadcaster.subscribe(websocket, subscription)
+        return json.dumps(dict(subscription.as_dict(), t="subscribed"))
+
+    if kind == "ping":
+        # Eco con la hora del servidor: el cliente mide el ida y vuelta con sus propios campos
+        return json.dumps(dict(msg, t="pong", server=time.time()))
+
+    if kind == "stats":
+        reply = {"t": "stats", "clients": broadcaster.snapshot()}
+        if scheduler:
+            reply["ticks"] = scheduler.snapshot()
+        if gate:
+            reply["suppression"] = gate.snapshot()
+        if metrics:
+            reply["timings"] = metrics.summary()
+        if udp:
+            reply["udp"] = udp.snapshot()
+        if startup:
+            reply["startup"] = startup.as_dict()
+        return json.dumps(reply)
+    return None
+
+
+def _timed_read(source, metrics):
+    """``(data, start)``: the frame and the monotonic time its read began."""
+    start = time.monotonic()
+    data = source.read()
+    metrics.read.observe(time.monotonic() - start)
+    return data, start
+
+
+def _report_ticks(ticks):
+    stats = ticks.snapshot(reset=True)
+    logging.info(f"⏱️ {stats['rate']} Hz: jitter medio {stats['jitter_avg_ms']} ms, "
+                 f"máx {stats['jitter_max_ms']} ms, ticks perdidos {stats['missed']}")
+
+
+async def _poll_loop(source, send, scheduler, metrics):
+    last_report = asyncio.get_running_loop().time()
+    while True:
+        data, read_at = _timed_read(source, metrics)
+        send(data, read_at)
+        if not data:
+            # Sin mando no hay nada que enviar: se sondea despacio, CPU casi a cero
+            await asyncio.sleep(IDLE_POLL)
+            scheduler.resync()
+            continue
+        now = await scheduler.wait()
+
+        if now - last_report >= TICK_REPORT_INTERVAL:
+            last_report = now
+            _report_ticks(scheduler)
+
+
+async def _thread_loop(input_thread, send):
+    """Forward frames sampled by the input thread; the loop only does network I/O."""
+    loop = asyncio.get_running_loop()
+    last_report = loop.time()
+    input_thread.start()
     try:
-        source = InputSource(config_path)
+        while True:
+            read_at, data = await input_thread.next_frame()
+            send(data, read_at)
+            if read_at - last_report >= TICK_REPORT_INTERVAL:
+                last_report = read_at
+                _report_ticks(input_thread)
+    finally:
+        input_thread.stop()
+
+
+async def _event_loop(source, send, metrics, min_interval=MIN_INTERVAL, keepalive=KEEPALIVE):
+    """Send a frame only when SDL reports joystick activity (plus keep-alives)."""
+    loop = asyncio.get_running_loop()
+    listen_joy_events()
+    send(*_timed_read(source, metrics))
+    last_sent = loop.time()
+
+    while True:
+        timeout = EVENT_WAIT_SLICE
+        if keepalive:
+            timeout = min(timeout, max(0.0, last_sent + keepalive - loop.time()))
+
+        # La espera bloquea en SDL, fuera del event loop de asyncio
+        changed = await loop.run_in_executor(None, wait_for_joy_event, timeout)
+
+        now = loop.time()
+        if changed or (keepalive and now - last_sent >= keepalive):
+            send(*_timed_read(source, metrics))
+            last_sent = now
+            # Dejamos que se acumule la ráfaga siguiente en un solo frame
+            await asyncio.sleep(min_interval)
+
+
+async def _watch_profiles(source, interval=PROFILE_POLL_INTERVAL):
+    """Reload the profiles when their files change, without touching the connections.
+
+    Polls a few ``stat()`` calls per interval; the rebuild (parse + compile)
+    runs in an executor and the swap happens here on the loop, between two
+    reads. Pads whose profile changed bump ``metadata_version``, so clients
+    get a metadata update instead of a disconnect.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        store = source.profiles
+        if not store.changed():
+            continue
+        seen = store.fingerprint()
+        await asyncio.sleep(PROFILE_SETTLE)
+        if store.fingerprint() != seen:
+            # Todavía se está escribiendo: se mira en la siguiente vuelta
+            continue
+
+        logging.info("🔄 Perfiles modificados en disco, recompilando...")
+        try:
+            profiles = await loop.run_in_executor(None, store.reload)
+            changed = source.swap_profiles(profiles)
+        except Exception as e:
+            # Nadie espera a esta tarea: si se dejara escapar, la recarga moriría en silencio
+            logging.error(f"No se pudieron recargar los perfiles, se mantienen los actuales: {e}")
+            store.built_from = seen
+            continue
+        logging.info(f"🔄 Perfiles recargados: {len(profiles)} indexados, {changed} mandos actualizados")
+
+
+def _make_backend(backend, virtual_pads=None, virtual_script=None, virtual_seed=None,
+                  replay=None, replay_speed=1.0, replay_loop=False, replay_start=0.0):
+    if backend == "virtual":
+        return VirtualBackend(virtual_pads, virtual_script, virtual_seed)
+    if backend == "replay":
+        return ReplayBackend(replay, replay_speed, replay_loop, replay_start)
+    return PygameBackend()
+
+
+async def _main_loop(port=WS_PORT, target_fps=TARGET_FPS, config_path=None, multi=False,
+                     event_driven=False, min_interval=MIN_INTERVAL, keepalive=KEEPALIVE,
+                     keyframe_interval=KEYFRAME_INTERVAL, max_buffer=MAX_WRITE_BUFFER, input_thread=False,
+                     record=None, replay=None, replay_speed=1.0, replay_loop=False, replay_start=0.0,
+                     suppress=False, epsilon=AXIS_EPSILON, epsilons=None, heartbeat=HEARTBEAT,
+                     backend="pygame", virtual_pads=None, virtual_script=None, virtual_seed=None,
+                     max_players=MAX_PLAYERS, udp=None, udp_ttl=MULTICAST_TTL, shm=None,
+                     profile_cache=PROFILE_CACHE_DIR, profile_poll=PROFILE_POLL_INTERVAL, gamecontrollerdb=None):
+    startup = StartupReport()
+    startup.mark("imports")
+    try:
+        if replay and backend != "replay":
+            source = ReplaySource(replay, replay_speed, replay_loop, multi, replay_start)
+        else:
+            device_backend = _make_backend(backend, virtual_pads, virtual_script, virtual_seed,
+                                           replay, replay_speed, replay_loop, replay_start)
+            if multi:
+                source = DeviceManager(config_path, max_players, device_backend, profile_cache, gamecontrollerdb)
+            else:
+                source = InputSource(config_path, device_backend, profile_cache, gamecontrollerdb)
     except Exception as e:
         logging.error(f"No se pudo iniciar el InputSource: {e}")
         return
 
-    logging.info(f"🎮 Backend Listo. Mando: {source.device_info.get('name')}")
+    startup.mark("source")
+
+    try:
+        recorder = Recorder(record) if record else None
+    except (OSError, ValueError) as e:
+        logging.error(f"No se pudo abrir la grabación {record}: {e}")
+        source.close()
+        return
+    try:
+        udp_output = UdpOutput(udp, udp_ttl) if udp else None
+    except OSError as e:
+        logging.error(f"No se pudo abrir la salida UDP: {e}")
+        source.close()
+        return
+    try:
+        publisher = SharedFramePublisher(shm, max_players if multi else 1) if shm else None
+    except OSError as e:
+        logging.error(f"No se pudo crear la memoria compartida {shm}: {e}")
+        source.close()
+        return
+    if recorder:
+        logging.info(f"⏺️ Grabando en {record}")
+
+    if isinstance(source, DeviceManager):
+        logging.info(f"🎮 Backend Listo (multi-mando). Mandos: {len(source.pads)}")
+    else:
+        logging.info(f"🎮 Backend Listo. Mando: {source.device_info.get('name')}")
     logging.info(f"📡 WebSocket Server en ws://localhost:{port}")
+    if udp_output:
+        logging.info(f"📨 Salida UDP a {', '.join(udp_output.snapshot()['targets'])}")
+    if publisher:
+        logging.info(f"🧠 Último frame en memoria compartida: {shm}")
 
-    connected_clients = set()
+    metrics = Metrics()
+    broadcaster = Broadcaster({
+        FORMAT_JSON: lambda: JsonEncoder(multi),
+        FORMAT_DELTA: lambda: DeltaEncoder(multi, keyframe_interval),
+        FORMAT_BINARY: lambda: BinaryEncoder(multi),
+    }, max_buffer, metrics)
+    loop = asyncio.get_running_loop()
+    if input_thread:
+        # Lo crea ya el servidor: la respuesta a "stats" lee sus ticks como los del TickScheduler
+        sampler = InputThread(source, target_fps, read_time=metrics.read, lateness=metrics.lateness)
+    else:
+        sampler = None
+    scheduler = None if event_driven or input_thread else TickScheduler(target_fps, metrics.lateness)
+    gate = ChangeGate(epsilon, epsilons, heartbeat) if suppress else None
 
     async def handler(websocket):
-        connected_clients.add(websocket)
+        fmt = client_format(websocket)
         try:
             await websocket.send(source.get_metadata_json())
-            await websocket.wait_closed()
+            broadcaster.add(websocket, fmt)
+            async for message in websocket:
+                reply = _handle_message(message, websocket, broadcaster, scheduler or sampler, gate, metrics,
+                                        udp_output, startup)
+                if reply:
+                    await websocket.send(reply)
+        except websockets.ConnectionClosed:
+            # Un cliente que se va sin cerrar (Wi-Fi caído, proceso muerto) no es un error del servidor
+            pass
         finally:
-            connected_clients.remove(websocket)
+            stats = broadcaster.remove(websocket)
+            if stats and stats.dropped:
+                logging.info(f"🐢 Cliente lento {websocket.remote_address}: "
+                             f"{stats.dropped} frames descartados de {stats.sent + stats.dropped} "
+                             f"({stats.coalesced} sustituidos en cola, {stats.downsampled} por ritmo adaptativo)")
 
-    async with websockets.serve(handler, "localhost", port):
-        frame_duration = 1.0 / target_fps
-        logging.info("🚀 Bucle de transmisión iniciado.")
-        try:
-            while True:
-                data = source.read()
+    metadata_version = source.metadata_version
 
-                if data and connected_clients:
-                    json_payload = InputSource.to_json(data)
-                    websockets.broadcast(connected_clients, json_payload)
+    def process_request(connection, request):
+        # Las métricas comparten puerto con el WebSocket: un GET normal a METRICS_PATH
+        if urlsplit(request.path).path == METRICS_PATH:
+            return connection.respond(HTTPStatus.OK, metrics.render(broadcaster, gate, udp_output))
+        return None
 
-                await asyncio.sleep(frame_duration)
+    def send(data, read_at):
+        nonlocal metadata_version
+        if source.metadata_version != metadata_version:
+            # Conexión o desconexión de un mando: se avisa sin cortar a nadie
+            metadata_version = source.metadata_version
+            broadcaster.send_all(source.get_metadata_json())
+        if recorder:
+            recorder.write(data, read_at)
+        if publisher:
+            # Los lectores locales quieren el estado actual: reciben cada lectura, también las suprimidas
+            publisher.publish(data, read_at)
+        now = loop.time()
+        # La grabación guarda todo; a los clientes sólo llegan los cambios
+        if gate and not gate.check(data, now):
+            return
+        if broadcaster.publish(data, now):
+            metrics.latency.observe(time.monotonic() - read_at)
+        if data and "first_frame" not in startup.marks:
+            startup.mark("first_frame")
+            logging.info(f"⚡ Arranque: {startup}")
+        if udp_output:
+            udp_output.send(data, read_at)
+
+    async with websockets.serve(handler, "localhost", port, select_subprotocol=select_subprotocol,
+                                process_request=process_request, write_limit=max_buffer):
+        startup.mark("listening")
+        logging.info(f"📈 Métricas en http://localhost:{port}{METRICS_PATH}")
+        logging.info("🚀 Bucle de transmisión iniciado.")
+        # Las grabaciones (--replay sin backend replay) no tienen perfiles que vigilar
+        watcher = None
+        if profile_poll and getattr(source, "profiles", None):
+            watcher = asyncio.create_task(_watch_profiles(source, profile_poll))
+        try:
+            if event_driven:
+                await _event_loop(source, send, metrics, min_interval, keepalive)
+            elif input_thread:
+                await _thread_loop(sampler, send)
+            else:
+                await _poll_loop(source, send, scheduler, metrics)
 
         except asyncio.CancelledError:
             logging.info("Deteniendo servidor...")
         finally:
+            if watcher:
+                watcher.cancel()
             source.close()
+            if recorder:
+                recorder.close()
+            if udp_output:
+                udp_output.close()
+            if publisher:
+                publisher.close()
+
+
+def _rate(value):
+    rate = int(value)
+    if not 0 < rate <= MAX_RATE:
+        raise argparse.ArgumentTypeError(f"debe estar entre 1 y {MAX_RATE} Hz")
+    return rate
+
+
+def _pad_count(value):
+    count = int(value)
+    if not 0 < count <= PLAYER_LIMIT:
+        # El índice de mando viaja en un byte en todos los formatos binarios
+        raise argparse.ArgumentTypeError(f"debe estar entre 1 y {PLAYER_LIMIT}")
+    return count
+
+
+def _epsilons(value):
+    """``0.02`` for every axis, or per axis: ``lx=0.02,ly=0.02,lt=0.05``."""
+    default, per_axis = None, {}
+    try:
+        for part in value.split(","):
+            name, sep, eps = part.partition("=")
+            if sep:
+                per_axis[name.strip()] = float(eps)
+            else:
+                default = float(name)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"épsilon inválido: {value}")
+    unknown = set(per_axis) - set(AXIS_FIELDS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"ejes desconocidos: {', '.join(sorted(unknown))}")
+    return default, per_axis
+
+
+def _udp_target(value):
+    try:
+        return parse_target(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="nexus-server", description="NexusController WebSocket server")
+    parser.add_argument("--port", type=int, default=WS_PORT)
+    parser.add_argument("--fps", type=_rate, default=TARGET_FPS, dest="target_fps",
+                        help=f"Frecuencia de sondeo en Hz, hasta {MAX_RATE} (default: %(default)s)")
+    parser.add_argument("--config", dest="config_path", default=None,
+                        help="Perfil JSON o directorio de perfiles indexados por GUID")
+    parser.add_argument("--gamecontrollerdb", action="append", metavar="FICHERO",
+                        help="Mappings de SDL (formato gamecontrollerdb.txt) para los mandos sin perfil "
+                             "propio (repetible; los últimos tienen prioridad)")
+    parser.add_argument("--profile-cache", metavar="DIR", default=PROFILE_CACHE_DIR,
+                        help="Directorio de la caché de perfiles compilados (\"\" = sin caché) "
+                             "(default: %(default)s)")
+    parser.add_argument("--profile-poll", type=float, default=PROFILE_POLL_INTERVAL, metavar="SEGUNDOS",
+                        help="Cada cuánto se comprueba si los perfiles han cambiado para recargarlos "
+                             "sin cortar a los clientes (0 = no vigilar) (default: %(default)s)")
+    parser.add_argument("--multi", action="store_true",
+                        help="Abrir todos los mandos y enviar un frame por tick con todos ellos")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--event-driven", action="store_true",
+                      help="Enviar sólo cuando SDL notifica cambios en vez de a FPS fijos")
+    mode.add_argument("--input-thread", action="store_true",
+                      help="Sondear SDL en un hilo propio a --fps, fuera del event loop")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL * 1000,
+                        help="Modo por eventos: ms mínimos entre frames (default: %(default)s)")
+    parser.add_argument("--keepalive", type=float, default=KEEPALIVE,
+                        help="Modo por eventos: segundos de reposo antes de reenviar el estado (0 = nunca)")
+    parser.add_argument("--keyframe-interval", type=float, default=KEYFRAME_INTERVAL,
+                        help="Protocolo delta: segundos entre frames completos (default: %(default)s)")
+    parser.add_argument("--max-buffer", type=int, default=MAX_WRITE_BUFFER,
+                        help="Bytes pendientes por cliente a partir de los cuales se le baja el ritmo "
+                             "y sólo se guarda su último frame")
+    parser.add_argument("--udp", type=_udp_target, action="append", metavar="HOST:PUERTO",
+                        help="Enviar además cada frame por UDP (binario con seq y timestamp) a este "
+                             "destino, unicast o multicast (repetible)")
+    parser.add_argument("--udp-ttl", type=int, default=MULTICAST_TTL,
+                        help="Saltos de los datagramas multicast (default: %(default)s)")
+    parser.add_argument("--shm", nargs="?", const=SHM_NAME, default=None, metavar="NOMBRE",
+                        help="Publicar el último frame en un segmento de memoria compartida para "
+                             f"procesos locales (default: {SHM_NAME})")
+    parser.add_argument("--record", metavar="FICHERO", default=None,
+                        help="Añadir cada frame leído a una grabación binaria")
+    parser.add_argument("--replay", metavar="FICHERO", default=None,
+                        help="Emitir una grabación en lugar de leer mandos reales")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Velocidad de reproducción (2 = doble; 0 = un frame grabado por tick)")
+    parser.add_argument("--replay-loop", action="store_true", help="Repetir la grabación al terminar")
+    parser.add_argument("--replay-start", type=float, default=0.0, metavar="SEGUNDOS",
+                        help="Empezar la reproducción en este punto de la grabación")
+    parser.add_argument("--backend", choices=BACKENDS, default="pygame",
+                        help="Origen de los mandos: SDL, mandos virtuales con guion, o la grabación de "
+                             "--replay pasando por todo el camino de lectura (default: %(default)s)")
+    parser.add_argument("--virtual-pads", type=_pad_count, default=None, metavar="N",
+                        help="Backend virtual: número de mandos (default: el del guion, o 1)")
+    parser.add_argument("--virtual-script", metavar="FICHERO", default=None,
+                        help="Backend virtual: guion JSON con la forma de onda de cada eje/botón")
+    parser.add_argument("--virtual-seed", type=int, default=None,
+                        help="Backend virtual: semilla de los paseos aleatorios")
+    parser.add_argument("--max-players", type=_pad_count, default=MAX_PLAYERS,
+                        help=f"Con --multi: mandos abiertos a la vez, hasta {PLAYER_LIMIT} (default: %(default)s)")
+    parser.add_argument("--suppress", action="store_true",
+                        help="No enviar frames que no cambian (los botones pasan siempre al instante)")
+    parser.add_argument("--epsilon", type=_epsilons, default=(AXIS_EPSILON, {}),
+                        help="Con --suppress: cambio mínimo de eje, global o por eje "
+                             f"(p. ej. 0.02 o 0.01,lt=0.05) (default: {AXIS_EPSILON})")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT,
+                        help="Con --suppress: segundos máximos sin enviar un frame (0 = nunca)")
+    args = parser.parse_args(argv)
+    if args.event_driven and (args.backend != "pygame" or args.replay):
+        parser.error("--event-driven espera eventos de SDL: sólo funciona con --backend pygame y sin --replay")
+    if args.backend == "replay" and not args.replay:
+        parser.error("--backend replay necesita --replay FICHERO")
+    args.min_interval /= 1000.0
+    args.profile_cache = args.profile_cache or None
+    default, args.epsilons = args.epsilon
+    args.epsilon = AXIS_EPSILON if default is None else default
+    return args
 
 
-def run():
+def run(argv=None):
     """Entry point function for the server script."""
+    args = _parse_args(argv)
+    # El servidor sólo lee mandos: no necesita surfarray/sndarray, y arranca sin sus imports
+    skip_pygame_extras()
     try:
-        asyncio.run(_main_loop())
+        asyncio.run(_main_loop(**vars(args)))
     except KeyboardInterrupt:
         pass
 
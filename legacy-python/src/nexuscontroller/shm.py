@@ -0,0 +1,160 @@
+import struct
+import time
+
+from .core import PAD_HEADER, PAYLOAD_SIZE, InputSource, wall_clock
+
+# Nombre por defecto del segmento (en Linux aparece en /dev/shm)
+SHM_NAME = "nexuscontroller"
+
+# Segmento: cabecera <4sBB2x (magic, versión, huecos de mando), seq u64 del seqlock,
+# y el frame: <qB7x (µs UNIX de la lectura, nº de mandos) + por mando su índice (B)
+# y los 14 bytes de to_bytes. El seq es impar mientras el servidor está escribiendo.
+MAGIC = b"NXSM"
+SHM_VERSION = 1
+LAYOUT = struct.Struct('<4sBB2x')
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = LAYOUT.size
+FRAME_HEADER = struct.Struct('<qB7x')
+FRAME_OFFSET = SEQ_OFFSET + SEQ.size
+SLOT_SIZE = PAD_HEADER.size + PAYLOAD_SIZE
+
+# Intentos de lectura antes de rendirse si el escritor no suelta el seqlock
+READ_RETRIES = 1000
+
+
+def _shared_memory():
+    # multiprocessing tarda ~10 ms en importarse: sólo lo pagan el servidor con --shm y los lectores
+    from multiprocessing import shared_memory
+    return shared_memory
+
+
+def _attach(name):
+    """Open an existing segment without letting this process's tracker unlink it on exit."""
+    shared_memory = _shared_memory()
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Python < 3.13: el resource_tracker borraría el segmento del servidor al salir el lector
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedFramePublisher:
+    """Keeps the latest frame in a shared memory segment for same-host readers.
+
+    Writes are guarded by a seqlock: the sequence goes odd, the frame is
+    written in place, and it goes even again, so the server never waits on
+    readers and readers detect (and retry) a read that overlapped a write.
+    ``slots`` is the most pads a frame can hold; extra pads are left out.
+    """
+
+    def __init__(self, name=SHM_NAME, slots=1):
+        size = FRAME_OFFSET + FRAME_HEADER.size + slots * SLOT_SIZE
+        shared_memory = _shared_memory()
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Segmento huérfano de una ejecución que no terminó limpiamente
+            stale = _attach(name)
+            stale.unlink()
+            stale.close()
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        self.name = name
+        self.slots = slots
+        self.seq = 0
+        LAYOUT.pack_into(self._shm.buf, 0, MAGIC, SHM_VERSION, slots)
+        SEQ.pack_into(self._shm.buf, SEQ_OFFSET, 0)
+
+    def publish(self, data, read_at=None):
+        """Make ``data`` (a dict, a list of dicts tagged with ``player``, or None) the current frame."""
+        if read_at is None:
+            read_at = time.monotonic()
+        stamp = int(wall_clock(read_at) * 1_000_000)
+        if not data:
+            pads = ()
+        elif isinstance(data, dict):
+            pads = ((0, data),)
+        else:
+            pads = tuple((d["player"], d) for d in data[:self.slots])
+        frame = FRAME_HEADER.pack(stamp, len(pads)) + b''.join(
+            PAD_HEADER.pack(index) + InputSource.to_bytes(d) for index, d in pads
+        )
+
+        buf = self._shm.buf
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq + 1)
+        buf[FRAME_OFFSET:FRAME_OFFSET + len(frame)] = frame
+        self.seq += 2
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+class SharedFrameReader:
+    """Reads the frames of a ``SharedFramePublisher`` from another process.
+
+    No sockets and no parsing on the hot path: ``changed()`` is one 8-byte
+    load, and ``read_raw()`` copies the frame block once into a buffer
+    reused across calls (the copy the seqlock needs to validate it).
+    ``read()`` decodes the pads like ``udp.decode``.
+    """
+
+    def __init__(self, name=SHM_NAME):
+        self._shm = _attach(name)
+        magic, version, slots = LAYOUT.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC or version != SHM_VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} no es un segmento de NexusController v{SHM_VERSION}")
+        self.slots = slots
+        self.seq = 0
+        self._frame = bytearray(FRAME_HEADER.size + slots * SLOT_SIZE)
+        self._view = memoryview(self._frame)
+
+    @property
+    def sequence(self):
+        """Current sequence of the segment (odd while a write is in progress)."""
+        return SEQ.unpack_from(self._shm.buf, SEQ_OFFSET)[0]
+
+    def changed(self):
+        """True if a frame was published since the last successful read."""
+        return self.sequence != self.seq
+
+    def read_raw(self, retries=READ_RETRIES):
+        """Consistent snapshot of the frame block as a memoryview, or None.
+
+        The view is only valid until the next call; ``None`` means every
+        attempt overlapped a write (or nothing was published yet).
+        """
+        buf = self._shm.buf
+        end = FRAME_OFFSET + len(self._frame)
+        for _ in range(retries):
+            before = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if not before:
+                return None
+            if before & 1:
+                continue
+            self._view[:] = buf[FRAME_OFFSET:end]
+            if SEQ.unpack_from(buf, SEQ_OFFSET)[0] == before:
+                self.seq = before
+                return self._view
+        return None
+
+    def read(self, retries=READ_RETRIES):
+        """``(seq, timestamp, {pad index: frame dict})`` of the latest frame, or None."""
+        view = self.read_raw(retries)
+        if view is None:
+            return None
+        stamp, count = FRAME_HEADER.unpack_from(view)
+        pads = {}
+        offset = FRAME_HEADER.size
+        for _ in range(count):
+            pads[view[offset]] = InputSource.from_bytes(view[offset + PAD_HEADER.size:offset + SLOT_SIZE])
+            offset += SLOT_SIZE
+        return self.seq, stamp / 1_000_000, pads
+
+    def close(self):
+        self._view.release()
+        self._shm.close()
@@ -0,0 +1,28 @@
+import time
+
+# Cuándo empezó a importarse el paquete: el origen de todos los hitos del arranque
+IMPORT_STARTED = time.perf_counter()
+
+
+class StartupReport:
+    """Milestones of a cold start, in ms since the package started importing.
+
+    Each ``mark()`` keeps only its first time, so it can sit on a hot path
+    (e.g. "first frame sent") without moving after the fact. For a
+    per-module breakdown of the imports use ``python -X importtime``.
+    """
+
+    def __init__(self, origin=IMPORT_STARTED):
+        self.origin = origin
+        self.marks = {}
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = round((time.perf_counter() - self.origin) * 1000, 1)
+        return self.marks[name]
+
+    def as_dict(self):
+        return dict(self.marks)
+
+    def __str__(self):
+        return ", ".join(f"{name} {ms} ms" for name, ms in self.marks.items())
@@ -0,0 +1,73 @@
+from .plan import AXIS_FIELDS, FIELDS
+
+# Variación mínima de un eje (en unidades -1..1) para que cuente como cambio
+AXIS_EPSILON = 0.01
+# Segundos máximos sin enviar nada aunque el mando esté quieto
+HEARTBEAT = 1.0
+
+_BUTTONS = tuple(name for name in FIELDS if name not in AXIS_FIELDS)
+
+
+class ChangeGate:
+    """Drops frames that don't differ meaningfully from the last one sent.
+
+    Buttons and d-pad compare exactly, so edges always go out on the tick
+    they happen. Each axis has its own epsilon (``epsilons`` overrides
+    ``default`` per field) and is compared against the last value *sent*,
+    so a slow drift still gets through once it adds up. ``heartbeat``
+    forces a frame after that many quiet seconds (0 = never).
+    """
+
+    def __init__(self, default=AXIS_EPSILON, epsilons=None, heartbeat=HEARTBEAT):
+        epsilons = epsilons or {}
+        unknown = set(epsilons) - set(AXIS_FIELDS)
+        if unknown:
+            raise ValueError(f"Ejes desconocidos: {', '.join(sorted(unknown))}")
+        self.axes = tuple((name, epsilons.get(name, default)) for name in AXIS_FIELDS)
+        self.heartbeat = heartbeat
+        self.last = None
+        self.last_sent = 0.0
+        self.passed = 0
+        self.suppressed = 0
+
+    def _changed(self, old, new):
+        for name in _BUTTONS:
+            if old.get(name) != new.get(name):
+                return True
+        for name, epsilon in self.axes:
+            if abs(new.get(name, 0.0) - old.get(name, 0.0)) > epsilon:
+                return True
+        return False
+
+    def _changed_multi(self, old, new):
+        if len(old) != len(new):
+            return True
+        for a, b in zip(old, new):
+            if a.get("player") != b.get("player") or self._changed(a, b):
+                return True
+        return False
+
+    def check(self, data, now):
+        """True if ``data`` has to be sent; it then becomes the reference."""
+        if not data:
+            # Sin mando: al volver se envía el primer frame sea cual sea
+            self.last = None
+            return True
+
+        send = (
+            self.last is None
+            or (self.heartbeat and now - self.last_sent >= self.heartbeat)
+            or (self._changed(self.last, data) if isinstance(data, dict)
+                else self._changed_multi(self.last, data))
+        )
+        if not send:
+            self.suppressed += 1
+            return False
+
+        self.last = data
+        self.last_sent = now
+        self.passed += 1
+        return True
+
+    def snapshot(self):
+        return {"passed": self.passed, "suppressed": self.suppressed}
@@ -0,0 +1,141 @@
+import ipaddress
+import random
+import socket
+import struct
+
+from .core import PAD_HEADER, PAYLOAD_SIZE, InputSource, wall_clock
+
+# Datagrama v2: cabecera <BIIqB (versión, sesión u32, seq u32, µs UNIX de la lectura, nº de mandos)
+# y por mando su índice (B) + los 14 bytes de to_bytes. Sin mando: cabecera con 0 mandos.
+# La sesión es aleatoria por emisor: si cambia, el emisor se ha reiniciado y el seq vuelve a empezar.
+UDP_VERSION = 2
+UDP_HEADER = struct.Struct('<BIIqB')
+
+# Saltos de router para los destinos multicast (1 = sólo la red local)
+MULTICAST_TTL = 1
+
+# Un seq más de esta distancia por detrás se toma como salto hacia delante, no como retraso
+SEQ_WINDOW = 1 << 16
+
+
+def parse_target(value):
+    """``host:port`` (or ``[v6]:port``) -> ``(host, port)``."""
+    host, sep, port = value.rpartition(":")
+    if not sep or not host or not port.isdigit():
+        raise ValueError(f"Destino UDP inválido (se espera host:puerto): {value}")
+    return host.strip("[]"), int(port)
+
+
+def encode(data, seq, timestamp, session=0):
+    """One datagram for ``data`` (a dict, a list of dicts tagged with ``player``, or None)."""
+    stamp = int(timestamp * 1_000_000)
+    if not data:
+        return UDP_HEADER.pack(UDP_VERSION, session, seq, stamp, 0)
+    if isinstance(data, dict):
+        return UDP_HEADER.pack(UDP_VERSION, session, seq, stamp, 1) + PAD_HEADER.pack(0) + InputSource.to_bytes(data)
+    return UDP_HEADER.pack(UDP_VERSION, session, seq, stamp, len(data)) + b''.join(
+        PAD_HEADER.pack(d["player"]) + InputSource.to_bytes(d) for d in data
+    )
+
+
+def decode(packet):
+    """Inverse of ``encode``: ``(session, seq, timestamp, {pad index: frame dict})``."""
+    version, session, seq, stamp, count = UDP_HEADER.unpack_from(packet)
+    if version != UDP_VERSION:
+        raise ValueError(f"Versión de datagrama desconocida: {version}")
+    pads = {}
+    offset = UDP_HEADER.size
+    for _ in range(count):
+        index = packet[offset]
+        offset += PAD_HEADER.size
+        pads[index] = InputSource.from_bytes(packet[offset:offset + PAYLOAD_SIZE])
+        offset += PAYLOAD_SIZE
+    return session, seq, stamp / 1_000_000, pads
+
+
+class SequenceFilter:
+    """Receiver side: keeps only datagrams newer than the last one accepted.
+
+    For real-time control a late frame is worse than a missing one, so
+    anything that arrives out of order is dropped rather than reordered.
+    A new ``session`` means the sender restarted: the order starts over.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.last = None
+        self.accepted = 0
+        self.stale = 0
+        self.restarts = 0
+
+    def accept(self, seq, session=None):
+        if session != self.session:
+            if self.session is not None:
+                self.restarts += 1
+            self.session = session
+            self.last = None
+        if self.last is not None:
+            behind = (self.last - seq) & 0xFFFFFFFF
+            if behind < SEQ_WINDOW:
+                self.stale += 1
+                return False
+        self.last = seq
+        self.accepted += 1
+        return True
+
+
+class UdpOutput:
+    """Sends every frame as one datagram to a list of unicast/multicast targets.
+
+    The sockets are non-blocking and used straight from the event loop: a
+    datagram the kernel can't take right away is dropped (``errors``), never
+    queued, so a dead or slow receiver costs nothing to the WebSocket clients.
+    """
+
+    def __init__(self, targets, ttl=MULTICAST_TTL):
+        self.targets = []
+        self._sockets = {}
+        for host, port in targets:
+            family, _, _, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+            sock = self._socket(family)
+            if ipaddress.ip_address(address[0]).is_multicast:
+                if family == socket.AF_INET6:
+                    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, ttl)
+                else:
+                    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.targets.append((sock, address))
+        self.session = random.getrandbits(32)
+        self.seq = 0
+        self.sent = 0
+        self.errors = 0
+        self.bytes_out = 0
+
+    def _socket(self, family):
+        sock = self._sockets.get(family)
+        if sock is None:
+            sock = self._sockets[family] = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+        return sock
+
+    def send(self, data, read_at):
+        """Send ``data``, stamped with the wall-clock time of its monotonic ``read_at``."""
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        packet = encode(data, self.seq, wall_clock(read_at), self.session)
+        for sock, address in self.targets:
+            try:
+                sock.sendto(packet, address)
+            except OSError:
+                # Buffer lleno o destino inalcanzable: este frame se pierde, el siguiente lo sustituye
+                self.errors += 1
+                continue
+            self.sent += 1
+            self.bytes_out += len(packet)
+
+    def snapshot(self):
+        return {"targets": [f"{a[0]}:{a[1]}" for _, a in self.targets], "session": self.session, "seq": self.seq,
+                "sent": self.sent, "errors": self.errors, "bytes_out": self.bytes_out}
+
+    def close(self):
+        for sock in self._sockets.values():
+            sock.close()
+        self._sockets.clear()
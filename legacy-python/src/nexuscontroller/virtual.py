@@ -0,0 +1,213 @@
+import json
+import math
+import random
+import time
+
+from .core import Backend
+
+# Guion por defecto: ejes con periodos distintos (no se sincronizan), botones
+# pulsando a ritmos distintos y la cruceta dando vueltas. Encaja con default_config.json.
+DEFAULT_SCRIPT = {
+    "axes": {
+        "0": {"wave": "sine", "period": 2.0},
+        "1": {"wave": "sine", "period": 3.0},
+        "2": {"wave": "walk", "step": 0.8},
+        "3": {"wave": "walk", "step": 0.8},
+        "4": {"wave": "triangle", "period": 1.5},
+        "5": {"wave": "triangle", "period": 2.5},
+    },
+    "buttons": {str(i): {"wave": "square", "period": 0.5 + 0.25 * i, "duty": 0.3} for i in range(10)},
+    "hats": {"0": {"wave": "cycle", "period": 0.5}},
+}
+
+# Orden en el que "cycle" recorre la cruceta (el último es el reposo)
+HAT_CYCLE = ((0, 1), (1, 0), (0, -1), (-1, 0), (0, 0))
+
+
+def _phase(t, cfg, offset):
+    return t / cfg.get("period", 1.0) + cfg.get("phase", 0.0) + offset
+
+
+def _axis_channel(cfg, offset, rng):
+    """Callable ``(t, dt) -> -1..1`` for one axis of the script."""
+    wave = cfg.get("wave", "sine")
+    amplitude = cfg.get("amplitude", 1.0)
+    center = cfg.get("offset", 0.0)
+
+    if wave == "constant":
+        return lambda t, dt: cfg.get("value", 0.0)
+    if wave == "sine":
+        return lambda t, dt: center + amplitude * math.sin(2 * math.pi * _phase(t, cfg, offset))
+    if wave == "triangle":
+        return lambda t, dt: center + amplitude * (1 - 4 * abs(_phase(t, cfg, offset) % 1 - 0.5))
+    if wave == "square":
+        return lambda t, dt: center + amplitude * (1 if _phase(t, cfg, offset) % 1 < cfg.get("duty", 0.5) else -1)
+    if wave == "walk":
+        # Paseo aleatorio con paso proporcional a sqrt(dt), rebotando en los extremos
+        step = cfg.get("step", 0.5)
+        state = [center]
+
+        def walk(t, dt):
+            v = state[0] + rng.gauss(0.0, step * math.sqrt(dt))
+            if v > 1.0:
+                v = 2.0 - v
+            elif v < -1.0:
+                v = -2.0 - v
+            state[0] = v
+            return v
+        return walk
+    raise ValueError(f"Forma de onda desconocida para un eje: {wave}")
+
+
+def _button_channel(cfg, offset, rng):
+    """Callable ``(t, dt) -> 0/1`` for one button of the script."""
+    wave = cfg.get("wave", "square")
+
+    if wave == "constant":
+        return lambda t, dt: int(cfg.get("value", 0))
+    if wave == "square":
+        return lambda t, dt: 1 if _phase(t, cfg, offset) % 1 < cfg.get("duty", 0.5) else 0
+    if wave == "random":
+        # Cambia de estado ``rate`` veces por segundo de media (proceso de Poisson)
+        rate = cfg.get("rate", 1.0)
+        state = [0]
+
+        def toggle(t, dt):
+            if rng.random() < rate * dt:
+                state[0] ^= 1
+            return state[0]
+        return toggle
+    raise ValueError(f"Forma de onda desconocida para un botón: {wave}")
+
+
+def _hat_channel(cfg, offset, rng):
+    """Callable ``(t, dt) -> (x, y)`` for one hat of the script."""
+    wave = cfg.get("wave", "cycle")
+
+    if wave == "constant":
+        return lambda t, dt: tuple(cfg.get("value", (0, 0)))
+    if wave == "cycle":
+        return lambda t, dt: HAT_CYCLE[int(_phase(t, cfg, offset)) % len(HAT_CYCLE)]
+    raise ValueError(f"Forma de onda desconocida para una cruceta: {wave}")
+
+
+def _channels(section, factory, offset, rng):
+    """``{"<index>": cfg}`` -> list of channels by index (None where undefined)."""
+    indices = {int(k): v for k, v in section.items()}
+    channels = [None] * (max(indices) + 1 if indices else 0)
+    for index, cfg in indices.items():
+        channels[index] = factory(cfg, offset, rng)
+    return channels
+
+
+def _sample(channels, t, dt, idle):
+    return [idle if channel is None else channel(t, dt) for channel in channels]
+
+
+class VirtualJoystick:
+    """Scripted joystick: every channel is a function of time, sampled on ``advance()``.
+
+    Getters just index the last sample, so all fields of a frame come
+    from the same instant, as with a real pump.
+    """
+
+    def __init__(self, index, script, rng):
+        self.index = index
+        self.name = script.get("name", f"Virtual {index}")
+        self.guid = script.get("guid")
+        # Cada mando desfasado respecto al anterior para que no vayan al unísono
+        offset = index * script.get("pad_phase", 0.37)
+        self._axes = _channels(script.get("axes", {}), _axis_channel, offset, rng)
+        self._buttons = _channels(script.get("buttons", {}), _button_channel, offset, rng)
+        self._hats = _channels(script.get("hats", {}), _hat_channel, offset, rng)
+        self.axes = [0.0] * len(self._axes)
+        self.buttons = [0] * len(self._buttons)
+        self.hats = [(0, 0)] * len(self._hats)
+
+    def advance(self, t, dt):
+        self.axes = _sample(self._axes, t, dt, 0.0)
+        self.buttons = _sample(self._buttons, t, dt, 0)
+        self.hats = _sample(self._hats, t, dt, (0, 0))
+
+    def init(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def get_name(self):
+        return self.name
+
+    def get_guid(self):
+        return self.guid
+
+    def get_instance_id(self):
+        return self.index
+
+    def get_numaxes(self):
+        return len(self.axes)
+
+    def get_numbuttons(self):
+        return len(self.buttons)
+
+    def get_numhats(self):
+        return len(self.hats)
+
+    def get_axis(self, i):
+        return self.axes[i] if i < len(self.axes) else 0.0
+
+    def get_button(self, i):
+        return self.buttons[i] if i < len(self.buttons) else 0
+
+    def get_hat(self, i):
+        return self.hats[i] if i < len(self.hats) else (0, 0)
+
+
+def load_script(script):
+    """A script dict, a path to a JSON script, or None for ``DEFAULT_SCRIPT``."""
+    if script is None:
+        return DEFAULT_SCRIPT
+    if isinstance(script, dict):
+        return script
+    with open(script, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class VirtualBackend(Backend):
+    """``pads`` scripted joysticks, no hardware needed (tests, load generation).
+
+    The script (see ``DEFAULT_SCRIPT``) gives each axis, button and hat a
+    waveform: axes ``sine``/``triangle``/``square``/``walk``/``constant``,
+    buttons ``square``/``random``/``constant``, hats ``cycle``/``constant``,
+    with ``period``, ``phase``, ``amplitude``, ``offset``, ``duty``, ``step``
+    or ``rate`` as they apply. ``pads`` overrides the script's own ``pads``;
+    ``seed`` makes random walks reproducible.
+    """
+
+    def __init__(self, pads=None, script=None, seed=None):
+        script = load_script(script)
+        pads = pads or script.get("pads", 1)
+        rng = random.Random(seed)
+        self.joysticks = [VirtualJoystick(i, script, rng) for i in range(pads)]
+        self._start = None
+        self._last = 0.0
+
+    def advance(self, t):
+        """Sample every joystick at ``t`` seconds since the start."""
+        dt = max(0.0, t - self._last)
+        self._last = t
+        for joystick in self.joysticks:
+            joystick.advance(t, dt)
+
+    def count(self):
+        return len(self.joysticks)
+
+    def open(self, index):
+        return self.joysticks[index]
+
+    def device_events(self):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        self.advance(now - self._start)
+        return []
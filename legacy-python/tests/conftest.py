@@ -0,0 +1,13 @@
+import pytest
+
+from nexuscontroller.plan import Frame
+
+
+@pytest.fixture
+def make_frame():
+    """Factory for a full frame dict (every field at rest) with some fields overridden."""
+    def make(**fields):
+        frame = Frame().as_dict()
+        frame.update(fields)
+        return frame
+    return make
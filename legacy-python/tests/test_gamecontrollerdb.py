@@ -0,0 +1,125 @@
+import pytest
+
+from nexuscontroller import gamecontrollerdb
+from nexuscontroller.plan import Frame, compile_profile
+
+XBOX_GUID = "030000005e0400008e02000014010000"
+XBOX_LINE = (
+    f"{XBOX_GUID},Xbox 360 Controller,a:b0,b:b1,back:b6,dpdown:h0.4,dpleft:h0.8,dpright:h0.2,"
+    "dpup:h0.1,guide:b8,leftshoulder:b4,leftstick:b9,lefttrigger:a2,leftx:a0,lefty:a1,"
+    "rightshoulder:b5,rightstick:b10,righttrigger:a5,rightx:a3,righty:a4,start:b7,x:b2,y:b3,"
+    "platform:Linux,"
+)
+
+
+class FakeJoystick:
+    """Just enough of a pygame joystick for ``ReadPlan.run``."""
+
+    def __init__(self, axes=(), buttons=(), hats=()):
+        self.axes = list(axes)
+        self.buttons = list(buttons)
+        self.hats = list(hats)
+
+    def get_numaxes(self):
+        return len(self.axes)
+
+    def get_numbuttons(self):
+        return len(self.buttons)
+
+    def get_numhats(self):
+        return len(self.hats)
+
+    def get_axis(self, i):
+        return self.axes[i]
+
+    def get_button(self, i):
+        return self.buttons[i]
+
+    def get_hat(self, i):
+        return self.hats[i]
+
+
+@pytest.mark.parametrize("line", ["", "   ", "# Linux", "xinput,XInput Controller,a:b0,"])
+def test_parse_line_skips_comments_and_malformed_lines(line):
+    assert gamecontrollerdb.parse_line(line) is None
+
+
+def test_parse_line():
+    guid, name, fields = gamecontrollerdb.parse_line(XBOX_LINE + "\n")
+    assert guid == XBOX_GUID
+    assert name == "Xbox 360 Controller"
+    assert fields["a"] == "b0"
+    assert fields["dpup"] == "h0.1"
+    assert fields["platform"] == "Linux"
+
+
+def test_normalize_guid_ignores_the_name_crc():
+    assert gamecontrollerdb.normalize_guid("0300ABCD5e0400008e02000014010000") == XBOX_GUID
+    assert gamecontrollerdb.normalize_guid("short") == "short"
+
+
+def test_to_profile():
+    profile = gamecontrollerdb.to_profile(*gamecontrollerdb.parse_line(XBOX_LINE)[1:], guid=XBOX_GUID)
+
+    assert profile["guid"] == XBOX_GUID
+    assert profile["buttons"]["face_bottom"] == 0
+    assert profile["buttons"]["select"] == 6
+    assert profile["buttons"]["thumbr"] == 10
+    # guide no tiene campo en el perfil
+    assert 8 not in profile["buttons"].values()
+    assert profile["axes"] == {
+        "left_stick_x": 0, "left_stick_y": 1, "right_stick_x": 3, "right_stick_y": 4,
+        "trigger_left": 2, "trigger_right": 5,
+    }
+    assert profile["hats"] == {"dpad": 0}
+    assert profile["baseline"] == {"2": -1.0, "5": -1.0}
+
+
+def test_to_profile_keeps_only_what_the_schema_expresses():
+    fields = {"a": "b0", "leftx": "+a0", "lefty": "a1~", "dpup": "b11", "dpdown": "b12", "righttrigger": "b7"}
+    profile = gamecontrollerdb.to_profile("Odd pad", fields)
+
+    assert profile["buttons"] == {"face_bottom": 0}
+    assert profile["axes"] == {}
+    assert "hats" not in profile
+    assert "baseline" not in profile
+
+
+def test_triggers_read_zero_at_rest_and_one_pressed():
+    profile = gamecontrollerdb.to_profile(*gamecontrollerdb.parse_line(XBOX_LINE)[1:])
+    plan = compile_profile(profile)
+
+    def read(lt, rt):
+        joystick = FakeJoystick(axes=[0.0, 0.0, lt, 0.0, 0.0, rt], buttons=[0] * 11, hats=[(0, 0)])
+        frame = Frame()
+        plan.run(joystick, frame.values)
+        return frame["lt"], frame["rt"]
+
+    assert read(-1.0, -1.0) == pytest.approx((0.0, 0.0))
+    assert read(1.0, 0.0) == pytest.approx((1.0, 0.5))
+
+
+def test_load_prefers_this_platform(tmp_path):
+    other = XBOX_LINE.replace("platform:Linux", "platform:Windows").replace("a:b0", "a:b9")
+    generic = XBOX_LINE.replace("platform:Linux,", "").replace("a:b0", "a:b5")
+    db = tmp_path / "gamecontrollerdb.txt"
+    db.write_text("\n".join(["# test", XBOX_LINE, other, generic]) + "\n", encoding="utf-8")
+
+    index = gamecontrollerdb.load([str(db)], platform="Linux")
+    assert index[XBOX_GUID][1]["a"] == "b0"
+
+    index = gamecontrollerdb.load([str(db)], platform="Windows")
+    assert index[XBOX_GUID][1]["a"] == "b9"
+
+    index = gamecontrollerdb.load([str(db)], platform="Mac OS X")
+    assert index[XBOX_GUID][1]["a"] == "b5"
+
+
+def test_later_files_override_earlier_ones(tmp_path):
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    first.write_text(XBOX_LINE + "\n", encoding="utf-8")
+    second.write_text(XBOX_LINE.replace("a:b0", "a:b1") + "\n", encoding="utf-8")
+
+    index = gamecontrollerdb.load([str(first), str(second)], platform="Linux")
+    assert index[XBOX_GUID][1]["a"] == "b1"
@@ -0,0 +1,111 @@
+import math
+
+import pytest
+
+from nexuscontroller.plan import SLOT, Frame
+from nexuscontroller.processing import LUT_SIZE, AxialStage, RadialStage, build_lut, compile_processing
+
+# Un paso de la tabla: la precisión con la que se puede comparar una salida
+STEP = 1 / (LUT_SIZE - 1)
+
+
+def _at(lut, m):
+    return lut[int(m * (LUT_SIZE - 1))]
+
+
+def test_linear_without_deadzone_is_identity():
+    lut = build_lut({})
+    assert len(lut) == LUT_SIZE
+    for m in (0.0, 0.25, 0.5, 1.0):
+        assert _at(lut, m) == pytest.approx(m, abs=STEP)
+
+
+def test_inner_deadzone_zeroes_and_rescales():
+    lut = build_lut({"deadzone": 0.2})
+    assert _at(lut, 0.1) == 0.0
+    assert _at(lut, 0.2) == 0.0
+    # Sin salto al salir de la deadzone: el resto del recorrido se reescala a 0..1
+    assert _at(lut, 0.21) == pytest.approx(0.0125, abs=2 * STEP)
+    assert _at(lut, 0.6) == pytest.approx(0.5, abs=2 * STEP)
+    assert _at(lut, 1.0) == 1.0
+
+
+def test_outer_deadzone_saturates():
+    lut = build_lut({"outer": 0.8})
+    assert _at(lut, 0.4) == pytest.approx(0.5, abs=2 * STEP)
+    assert _at(lut, 0.8) == 1.0
+    assert _at(lut, 0.95) == 1.0
+
+
+def test_explicit_deadzone_wins_over_the_calibrated_one():
+    assert _at(build_lut({}, deadzone=0.3), 0.25) == 0.0
+    assert _at(build_lut({"deadzone": 0.1}, deadzone=0.3), 0.25) > 0.0
+
+
+@pytest.mark.parametrize("cfg", [{"deadzone": -0.1}, {"deadzone": 0.5, "outer": 0.5}, {"outer": 1.5}])
+def test_invalid_deadzones(cfg):
+    with pytest.raises(ValueError):
+        build_lut(cfg)
+
+
+def test_curves():
+    exponential = build_lut({"curve": "exponential", "exponent": 3})
+    assert _at(exponential, 0.5) == pytest.approx(0.125, abs=2 * STEP)
+
+    custom = build_lut({"curve": "custom", "points": [[0.5, 0.2]]})
+    assert _at(custom, 0.25) == pytest.approx(0.1, abs=2 * STEP)
+    assert _at(custom, 0.75) == pytest.approx(0.6, abs=2 * STEP)
+
+    with pytest.raises(ValueError):
+        build_lut({"curve": "sigmoid"})
+
+
+def test_axial_stage_keeps_the_sign():
+    values = Frame().values
+    values[SLOT["lx"]], values[SLOT["ly"]] = -0.6, 0.1
+    AxialStage((SLOT["lx"], SLOT["ly"]), build_lut({"deadzone": 0.2}))(values)
+
+    assert values[SLOT["lx"]] == pytest.approx(-0.5, abs=2 * STEP)
+    assert values[SLOT["ly"]] == 0.0
+
+
+def test_radial_stage_keeps_the_direction():
+    values = Frame().values
+    values[SLOT["lx"]], values[SLOT["ly"]] = 0.36, -0.48
+    RadialStage(SLOT["lx"], SLOT["ly"], build_lut({"deadzone": 0.2}))(values)
+
+    x, y = values[SLOT["lx"]], values[SLOT["ly"]]
+    assert math.hypot(x, y) == pytest.approx(0.5, abs=2 * STEP)
+    assert math.atan2(y, x) == pytest.approx(math.atan2(-0.48, 0.36))
+
+
+def test_radial_deadzone_is_on_the_magnitude():
+    lut = build_lut({"deadzone": 0.2})
+    values = Frame().values
+    # Cada eje por debajo de la deadzone, pero la magnitud no
+    values[SLOT["lx"]], values[SLOT["ly"]] = 0.18, 0.18
+    RadialStage(SLOT["lx"], SLOT["ly"], lut)(values)
+    assert values[SLOT["lx"]] > 0.0
+
+    values[SLOT["lx"]], values[SLOT["ly"]] = 0.1, 0.1
+    RadialStage(SLOT["lx"], SLOT["ly"], lut)(values)
+    assert (values[SLOT["lx"]], values[SLOT["ly"]]) == (0.0, 0.0)
+
+
+def test_compile_processing_uses_calibrated_noise():
+    mapping = {
+        "axes": {"left_stick_x": 0, "left_stick_y": 1, "trigger_left": 2},
+        "calibration": {"noise": {"0": 0.02, "1": 0.1}},
+        "processing": {"left_stick": {"type": "axial"}, "trigger_left": {}, "trigger_right": {}},
+    }
+    stages = compile_processing(mapping, SLOT)
+
+    # trigger_right no tiene eje en el perfil: no genera etapa
+    assert len(stages) == 2
+    stick, trigger = stages
+    assert isinstance(stick, AxialStage)
+    # La deadzone del stick sale del eje más ruidoso de los dos (0.1 * 1.5)
+    assert _at(stick.lut, 0.14) == 0.0
+    assert _at(stick.lut, 0.16) > 0.0
+    # El gatillo no tiene ruido calibrado: sin deadzone
+    assert _at(trigger.lut, 0.01) > 0.0
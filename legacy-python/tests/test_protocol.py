@@ -0,0 +1,76 @@
+import json
+
+from nexuscontroller.protocol import DeltaEncoder
+
+
+def _decode(message):
+    return json.loads(message) if message else None
+
+
+def test_first_frame_is_a_keyframe(make_frame):
+    encoder = DeltaEncoder()
+    assert encoder.keyframe() is None
+
+    msg = _decode(encoder.encode(make_frame(a=1), 0.0))
+    assert msg["t"] == "key"
+    assert msg["seq"] == 1
+    assert msg["d"]["a"] == 1
+
+
+def test_delta_carries_only_changed_fields(make_frame):
+    encoder = DeltaEncoder()
+    encoder.encode(make_frame(), 0.0)
+
+    msg = _decode(encoder.encode(make_frame(a=1, lx=0.123456), 0.1))
+    assert msg == {"t": "delta", "seq": 2, "d": {"a": 1, "lx": 0.1235}}
+
+
+def test_unchanged_frame_sends_nothing_and_keeps_seq(make_frame):
+    encoder = DeltaEncoder()
+    encoder.encode(make_frame(), 0.0)
+
+    assert encoder.encode(make_frame(), 0.1) is None
+    # Un cambio por debajo del redondeo del JSON tampoco cuenta
+    assert encoder.encode(make_frame(lx=0.00001), 0.2) is None
+    assert _decode(encoder.encode(make_frame(b=1), 0.3))["seq"] == 2
+
+
+def test_keyframe_every_interval(make_frame):
+    encoder = DeltaEncoder(keyframe_interval=1.0)
+    encoder.encode(make_frame(), 0.0)
+    assert _decode(encoder.encode(make_frame(a=1), 0.5))["t"] == "delta"
+
+    msg = _decode(encoder.encode(make_frame(a=0), 1.0))
+    assert msg["t"] == "key"
+    assert msg["seq"] == 3
+    assert _decode(encoder.encode(make_frame(a=1), 1.5))["t"] == "delta"
+
+
+def test_keyframe_for_a_late_joiner_repeats_the_current_seq(make_frame):
+    encoder = DeltaEncoder()
+    encoder.encode(make_frame(), 0.0)
+    encoder.encode(make_frame(a=1), 0.1)
+
+    msg = _decode(encoder.keyframe())
+    assert msg["t"] == "key"
+    assert msg["seq"] == 2
+    assert msg["d"]["a"] == 1
+    # Pedir un keyframe no gasta seq: el siguiente delta sigue la cuenta
+    assert _decode(encoder.encode(make_frame(a=0), 0.2))["seq"] == 3
+
+
+def test_multi_deltas_are_keyed_by_player(make_frame):
+    encoder = DeltaEncoder(multi=True)
+    encoder.encode([dict(make_frame(), player=0), dict(make_frame(), player=1)], 0.0)
+
+    msg = _decode(encoder.encode([dict(make_frame(), player=0), dict(make_frame(x=1), player=1)], 0.1))
+    assert msg == {"t": "delta", "seq": 2, "d": {"1": {"x": 1}}}
+
+
+def test_multi_pad_set_change_forces_a_keyframe(make_frame):
+    encoder = DeltaEncoder(multi=True)
+    encoder.encode([dict(make_frame(), player=0)], 0.0)
+
+    msg = _decode(encoder.encode([dict(make_frame(), player=0), dict(make_frame(), player=1)], 0.1))
+    assert msg["t"] == "key"
+    assert set(msg["d"]) == {"0", "1"}
@@ -0,0 +1,137 @@
+import time
+
+import pytest
+
+from nexuscontroller.core import InputSource
+from nexuscontroller.recording import INDEX_EVERY, MAGIC, RECORD_SIZE, Recorder, Recording
+
+
+def _record(path, frames):
+    """Write ``(offset, data)`` pairs; offsets are seconds after the recorder opens."""
+    recorder = Recorder(str(path))
+    base = time.monotonic()
+    for offset, data in frames:
+        recorder.write(data, base + offset)
+    recorder.close()
+
+
+def test_round_trip(tmp_path, make_frame):
+    path = tmp_path / "session.rec"
+    frames = [make_frame(a=1, lx=0.5), make_frame(b=1, lx=-0.25), make_frame(up=1, rt=1.0)]
+    _record(path, [(i * 0.1, d) for i, d in enumerate(frames)])
+
+    rec = Recording(str(path))
+    try:
+        assert len(rec) == 3
+        assert rec.duration == pytest.approx(0.2, abs=1e-3)
+        for i, expected in enumerate(frames):
+            t, pad, payload = rec.record(i)
+            assert pad == 0
+            assert bytes(payload) == InputSource.to_bytes(expected)
+            assert InputSource.from_bytes(payload)["lx"] == pytest.approx(expected["lx"], abs=1 / 32767)
+    finally:
+        rec.close()
+
+
+def test_multi_pad_frames_share_a_timestamp(tmp_path, make_frame):
+    path = tmp_path / "multi.rec"
+    tick = [dict(make_frame(a=1), player=0), dict(make_frame(b=1), player=3)]
+    _record(path, [(0.0, tick), (0.1, tick[:1])])
+
+    rec = Recording(str(path))
+    try:
+        pads, nxt = rec.frame(0)
+        assert [pad for pad, _ in pads] == [0, 3]
+        assert nxt == 2
+        assert rec.frame_start(1) == 0
+        assert [pad for pad, _ in rec.frame(nxt)[0]] == [0]
+    finally:
+        rec.close()
+
+
+def test_empty_frames_are_not_written(tmp_path):
+    path = tmp_path / "empty.rec"
+    _record(path, [(0.0, None), (0.1, [])])
+    assert path.read_bytes() == MAGIC
+
+
+def test_append_continues_the_timeline(tmp_path, make_frame):
+    path = tmp_path / "append.rec"
+    _record(path, [(0.0, make_frame()), (0.5, make_frame())])
+    _record(path, [(0.0, make_frame(a=1))])
+
+    rec = Recording(str(path))
+    try:
+        assert len(rec) == 3
+        # El primer frame añadido no puede quedar antes que los ya grabados
+        assert rec.timestamp(2) >= rec.timestamp(1)
+    finally:
+        rec.close()
+
+
+def test_seek(tmp_path, make_frame):
+    path = tmp_path / "long.rec"
+    count = INDEX_EVERY * 3 + 10
+    # Dos registros por instante: seek devuelve el primero y seek_after salta los dos
+    _record(path, [(i // 2 * 0.01, make_frame()) for i in range(count)])
+
+    rec = Recording(str(path))
+    try:
+        assert len(rec.index) == 4
+        for i in (0, 1, INDEX_EVERY, INDEX_EVERY + 1, count - 1):
+            t = rec.timestamp(i)
+            assert rec.seek(t) == i - i % 2
+            assert rec.seek_after(t) == min(count, i - i % 2 + 2)
+        assert rec.seek(-1.0) == 0
+        assert rec.seek(rec.duration + 1.0) == count
+    finally:
+        rec.close()
+
+
+def test_torn_tail_is_ignored_on_read(tmp_path, make_frame):
+    path = tmp_path / "torn.rec"
+    _record(path, [(0.0, make_frame()), (0.1, make_frame())])
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (RECORD_SIZE // 2))
+
+    rec = Recording(str(path))
+    try:
+        assert len(rec) == 2
+    finally:
+        rec.close()
+
+
+def test_torn_tail_is_truncated_before_appending(tmp_path, make_frame):
+    path = tmp_path / "torn.rec"
+    _record(path, [(0.0, make_frame()), (0.1, make_frame())])
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD_SIZE - 1))
+
+    _record(path, [(0.0, make_frame(a=1))])
+    assert path.stat().st_size == len(MAGIC) + 3 * RECORD_SIZE
+
+    rec = Recording(str(path))
+    try:
+        assert InputSource.from_bytes(rec.record(2)[2])["a"] == 1
+        assert rec.timestamp(2) >= rec.timestamp(1)
+    finally:
+        rec.close()
+
+
+def test_header_cut_short_starts_over(tmp_path, make_frame):
+    path = tmp_path / "short.rec"
+    path.write_bytes(MAGIC[:3])
+
+    _record(path, [(0.0, make_frame())])
+    assert path.stat().st_size == len(MAGIC) + RECORD_SIZE
+
+
+def test_rejects_other_files(tmp_path, make_frame):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"not a recording at all")
+
+    with pytest.raises(ValueError):
+        Recorder(str(path))
+    with pytest.raises(ValueError):
+        Recording(str(path))
+    assert path.read_bytes() == b"not a recording at all"
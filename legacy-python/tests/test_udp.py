@@ -0,0 +1,75 @@
+import pytest
+
+from nexuscontroller.udp import SEQ_WINDOW, SequenceFilter, decode, encode, parse_target
+
+
+def test_encode_decode_round_trip(make_frame):
+    frames = [dict(make_frame(a=1, lx=0.5), player=0), dict(make_frame(start=1, ry=-1.0), player=2)]
+
+    session, seq, timestamp, pads = decode(encode(frames, 42, 1700000000.25, session=7))
+    assert (session, seq) == (7, 42)
+    assert timestamp == pytest.approx(1700000000.25, abs=1e-6)
+    assert sorted(pads) == [0, 2]
+    assert pads[0]["a"] == 1
+    assert pads[0]["lx"] == pytest.approx(0.5, abs=1 / 32767)
+    assert pads[2]["start"] == 1
+    assert pads[2]["ry"] == pytest.approx(-1.0, abs=1 / 32767)
+
+
+def test_no_pad_is_an_empty_datagram():
+    assert decode(encode(None, 1, 0.0))[3] == {}
+
+
+def test_decode_rejects_other_versions(make_frame):
+    packet = bytearray(encode(make_frame(), 1, 0.0))
+    packet[0] = 1
+    with pytest.raises(ValueError):
+        decode(bytes(packet))
+
+
+def test_filter_drops_late_and_repeated_datagrams():
+    f = SequenceFilter()
+    assert [f.accept(seq, 1) for seq in (1, 2, 4, 3, 4, 5)] == [True, True, True, False, False, True]
+    assert (f.accepted, f.stale) == (4, 2)
+
+
+def test_filter_follows_the_counter_across_wraparound():
+    f = SequenceFilter()
+    assert f.accept(0xFFFFFFFE, 1)
+    assert f.accept(0xFFFFFFFF, 1)
+    assert f.accept(0, 1)
+    assert f.accept(1, 1)
+    assert not f.accept(0xFFFFFFFF, 1)
+
+
+def test_filter_takes_a_far_jump_as_new_data():
+    f = SequenceFilter()
+    f.accept(SEQ_WINDOW * 2, 1)
+    assert f.accept(SEQ_WINDOW - 1, 1)
+
+
+def test_filter_starts_over_when_the_sender_restarts():
+    f = SequenceFilter()
+    for seq in range(1, 1001):
+        f.accept(seq, 1)
+
+    # Emisor reiniciado: otra sesión, y el seq vuelve a 1
+    assert [f.accept(seq, 2) for seq in (1, 2, 3)] == [True, True, True]
+    assert f.restarts == 1
+    assert f.stale == 0
+    assert not f.accept(2, 2)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("127.0.0.1:9000", ("127.0.0.1", 9000)),
+    ("[::1]:9000", ("::1", 9000)),
+    ("239.0.0.1:5005", ("239.0.0.1", 5005)),
+])
+def test_parse_target(value, expected):
+    assert parse_target(value) == expected
+
+
+@pytest.mark.parametrize("value", ["localhost", ":9000", "host:port"])
+def test_parse_target_rejects(value):
+    with pytest.raises(ValueError):
+        parse_target(value)